@@ -3,14 +3,11 @@ import logging
 from sys import exit
 
 import discord
-import pymongo
 from discord.ext import commands
 
 LOG_FORMAT = '%(levelname)s [%(asctime)s]: %(message)s'
 logging.basicConfig(format=LOG_FORMAT, level=logging.INFO)
 
-import tools
-
 try:
     import config
 
@@ -18,7 +15,8 @@ except ImportError:
     logging.critical('[Bot] config.py does not exist, you should make one from the example config')
     exit(1)
 
-mclient = pymongo.MongoClient(config.mongoURI)
+import database
+
 intents = discord.Intents(
     guilds=True,
     members=True,
@@ -106,6 +104,9 @@ class MechaBowser(commands.Bot):
 
             use_sentry(self, dsn=config.DSN, traces_sample_rate=1.0, environment='production')
 
+        # Single MongoDB pool shared by every extension through database.client()
+        self.mongo = database.client()
+
     async def setup_hook(self):
         await self.add_cog(BotCache(self))
         await self.add_cog(AutomodSubstitute(self))
@@ -114,11 +115,11 @@ class MechaBowser(commands.Bot):
     async def on_message(self, message):
         return  # Return so commands will not process, and main extension can process instead
 
+    async def close(self):
+        await super().close()
+        database.close_all()
 
-bot = MechaBowser()
 
-
-@bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, exception):
     async def send_followup(content):
         if interaction.is_expired():
@@ -163,6 +164,12 @@ async def on_app_command_error(interaction: discord.Interaction, exception):
         raise
 
 
+# Profile render workers are spawned and re-import this module as __mp_main__, so nothing that opens connections
+# may run at import time
 if __name__ == '__main__':
+    import tools
+
     logging.info('\033[94mMechaBowser by mattbsg & lyrus ©2019-2026\033[0m')
+    bot = MechaBowser()
+    bot.tree.error(on_app_command_error)
     asyncio.run(bot.start(config.token))
@@ -0,0 +1,140 @@
+import collections
+import logging
+import os
+import typing
+
+
+class LRUCache:
+    '''
+    Least recently used mapping bounded by item count and, optionally, by total size as reported by `sizeof`.
+    Hit and miss counts are kept in `stats` so callers can report cache effectiveness.
+    '''
+
+    def __init__(
+        self,
+        max_items: int = 1024,
+        max_bytes: typing.Optional[int] = None,
+        sizeof: typing.Callable[[typing.Any], int] = len,
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.size = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._data = collections.OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            self.stats['misses'] += 1
+            return default
+
+        self.stats['hits'] += 1
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        if key in self._data:
+            self.pop(key)
+
+        self._data[key] = value
+        if self.max_bytes is not None:
+            self.size += self.sizeof(value)
+
+        while len(self._data) > self.max_items or (self.max_bytes is not None and self.size > self.max_bytes):
+            if len(self._data) == 1:  # A single oversized value is still kept, it would be refetched otherwise
+                break
+
+            self.pop(next(iter(self._data)))
+            self.stats['evictions'] += 1
+
+    def pop(self, key, default=None):
+        if key not in self._data:
+            return default
+
+        value = self._data.pop(key)
+        if self.max_bytes is not None:
+            self.size -= self.sizeof(value)
+
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self.size = 0
+
+
+class DiskCache:
+    '''
+    Directory of files keyed by a filesystem safe string, i.e. a hex digest. Once the directory grows beyond
+    `max_bytes` the least recently written files are removed.
+    '''
+
+    def __init__(self, path: str, max_bytes: int, suffix: str = ''):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        os.makedirs(path, exist_ok=True)
+
+        self.size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.isfile(self._file(key))
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + self.suffix)
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        try:
+            with open(self._file(key), 'rb') as f:
+                return f.read()
+
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._file(key)
+        temp = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temp, 'wb') as f:
+                f.write(data)
+
+            os.replace(temp, path)  # Atomic, readers never see a partial file
+
+        except OSError as e:
+            logging.error(f'[Cache] Unable to write {path}: {e}')
+            return
+
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.prune()
+
+    def delete(self, key: str):
+        try:
+            path = self._file(key)
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.size -= size
+
+        except FileNotFoundError:
+            pass
+
+    def prune(self):
+        '''Remove the oldest files until the directory is at 90% of its budget'''
+        entries = sorted((e for e in os.scandir(self.path) if e.is_file()), key=lambda e: e.stat().st_mtime)
+        self.size = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self.size -= size
+
+            except FileNotFoundError:
+                pass
@@ -10,6 +10,17 @@ dekudeals = 'key'
 
 # Mongo Credentials
 mongoURI = 'MongoDB URI'
+# Shared connection pool tuning, passed straight to pymongo.MongoClient
+mongoOptions = {
+    'maxPoolSize': 50,
+    'minPoolSize': 5,
+    'connectTimeoutMS': 5000,
+    'serverSelectionTimeoutMS': 10000,
+    'socketTimeoutMS': 30000,
+    'readPreference': 'primaryPreferred',
+}
+# Threads available for running blocking database calls off the event loop
+mongoExecutorWorkers: int = 16
 
 # Users
 parakarry: int = bot
@@ -80,6 +91,13 @@ banAppealInvite: str = invite_to_ban_appeal_server
 
 # Web
 baseUrl = 'https://example.com'
+
+# Worker processes used to render profile cards
+profileRenderWorkers: int = 2
+profileRenderConcurrency: int = 4  # Profile renders in progress at once, including avatar and icon downloads
+# Image output per kind, 'card' or 'preview'. See profile_render.ENCODER_DEFAULTS, i.e. {'preview': {'format': 'JPEG', 'quality': 85}}
+profileEncoder: dict = {}
+
 # Text constants
 punDM = (
     'You have received a moderation action on the /r/NintendoSwitch Discord server.\n'
@@ -0,0 +1,435 @@
+import asyncio
+import functools
+import logging
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import pymongo
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+_clients: typing.Dict[str, 'AsyncMongoClient'] = {}
+
+# Changes to config.mongoOptions for specific named clients. Maintenance jobs run aggregations over whole collections
+# that outlast the socket timeout meant for interactive queries, so they bound themselves with maxTimeMS instead
+CLIENT_OPTIONS: typing.Dict[str, dict] = {
+    'maintenance': {'socketTimeoutMS': None, 'maxPoolSize': 4, 'minPoolSize': 0},
+}
+
+# Indexes every collection is expected to have, keyed by (database, collection). Index names are left to MongoDB's
+# defaults (i.e. author_1_timestamp_-1) so that indexes created by hand with the same keys are recognised.
+INDEXES: typing.Dict[typing.Tuple[str, str], typing.List[IndexModel]] = {
+    ('bowser', 'messages'): [
+        IndexModel([('author', ASCENDING), ('timestamp', DESCENDING)]),  # /info, profile message count
+        IndexModel([('timestamp', ASCENDING)]),  # /stats server, bulk delete lookups, EUD sanitization
+        IndexModel([('channel', ASCENDING), ('timestamp', ASCENDING)]),  # /stats channel
+    ],
+    ('bowser', 'puns'): [
+        IndexModel([('user', ASCENDING), ('type', ASCENDING), ('active', ASCENDING)]),  # /history, /strike, joins
+        IndexModel([('user', ASCENDING), ('timestamp', DESCENDING)]),  # /history ordering, unban/ban listeners
+        IndexModel([('active', ASCENDING), ('type', ASCENDING)]),  # Expiry scheduling on startup
+        IndexModel([('public', ASCENDING), ('public_log_message', ASCENDING)]),  # Pending public modlogs
+        IndexModel([('timestamp', ASCENDING), ('type', ASCENDING)]),  # /stats server
+    ],
+    ('bowser', 'users'): [
+        IndexModel([('roles', ASCENDING)]),  # Role deletion cleanup
+        IndexModel([('timezone', ASCENDING)], sparse=True),  # Timezone tally
+        IndexModel([('favgames', ASCENDING)], sparse=True),  # Favourite game tally
+    ],
+    ('bowser', 'archive'): [IndexModel([('timestamp', ASCENDING)])],
+    ('bowser', 'member_flow'): [
+        IndexModel([('timestamp', ASCENDING)]),  # /stats server
+        IndexModel([('user', ASCENDING), ('type', ASCENDING), ('timestamp', ASCENDING)], unique=True),  # Backfill
+    ],
+    ('bowser', 'games'): [IndexModel([('deku_id', ASCENDING)], unique=True)],
+    ('modmail', 'logs'): [
+        IndexModel([('recipient.id', ASCENDING), ('open', ASCENDING), ('ban_appeal', ASCENDING)]),
+    ],
+}
+
+
+class AsyncMongoClient:
+    '''
+    Awaitable wrapper around a pymongo.MongoClient. Every blocking call is run on a bounded thread pool so that
+    slow database operations do not stall the event loop. The underlying pymongo objects remain available as
+    `delegate` for the rare case where synchronous access is needed.
+    '''
+
+    def __init__(self, *args, executor_workers: int = 16, **kwargs):
+        self.delegate = pymongo.MongoClient(*args, **kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix='mongo')
+
+    def __getattr__(self, name: str) -> 'AsyncDatabase':
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        return AsyncDatabase(self, self.delegate[name])
+
+    def __getitem__(self, name: str) -> 'AsyncDatabase':
+        return AsyncDatabase(self, self.delegate[name])
+
+    async def run(self, func: typing.Callable, *args, **kwargs):
+        '''Run a blocking callable on the database executor and await its result'''
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.delegate.close()
+        logging.info('[Database] Closed MongoDB client')
+
+
+class AsyncDatabase:
+    def __init__(self, client: AsyncMongoClient, delegate: pymongo.database.Database):
+        self.client = client
+        self.delegate = delegate
+
+    def __getattr__(self, name: str) -> 'AsyncCollection':
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        return AsyncCollection(self.client, self.delegate[name])
+
+    def __getitem__(self, name: str) -> 'AsyncCollection':
+        return AsyncCollection(self.client, self.delegate[name])
+
+    async def command(self, *args, **kwargs):
+        return await self.client.run(self.delegate.command, *args, **kwargs)
+
+
+def _awaitable(name: str):
+    async def method(self, *args, **kwargs):
+        return await self.client.run(getattr(self.delegate, name), *args, **kwargs)
+
+    method.__name__ = name
+    method.__doc__ = f'Awaitable equivalent of pymongo.collection.Collection.{name}'
+    return method
+
+
+class AsyncCollection:
+    def __init__(self, client: AsyncMongoClient, delegate: pymongo.collection.Collection):
+        self.client = client
+        self.delegate = delegate
+
+    def __getattr__(self, name: str) -> 'AsyncCollection':
+        # Sub-collections, i.e. mclient.modmail.logs
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        return AsyncCollection(self.client, self.delegate[name])
+
+    find_one = _awaitable('find_one')
+    find_one_and_update = _awaitable('find_one_and_update')
+    find_one_and_delete = _awaitable('find_one_and_delete')
+    insert_one = _awaitable('insert_one')
+    insert_many = _awaitable('insert_many')
+    replace_one = _awaitable('replace_one')
+    update_one = _awaitable('update_one')
+    update_many = _awaitable('update_many')
+    delete_one = _awaitable('delete_one')
+    delete_many = _awaitable('delete_many')
+    count_documents = _awaitable('count_documents')
+    estimated_document_count = _awaitable('estimated_document_count')
+    distinct = _awaitable('distinct')
+    bulk_write = _awaitable('bulk_write')
+    create_index = _awaitable('create_index')
+    create_indexes = _awaitable('create_indexes')
+    index_information = _awaitable('index_information')
+
+    async def aggregate(self, pipeline: list, **kwargs) -> list:
+        return await self.client.run(lambda: list(self.delegate.aggregate(pipeline, **kwargs)))
+
+    def find(self, *args, **kwargs) -> 'AsyncCursor':
+        return AsyncCursor(self.client, self.delegate.find(*args, **kwargs))
+
+
+class AsyncCursor:
+    '''
+    Awaitable wrapper around a pymongo cursor. Supports chaining `sort`, `limit` and `skip` before iteration,
+    `await cursor.to_list()` and `async for`. Documents are fetched in batches on the database executor.
+    '''
+
+    BATCH_SIZE = 100
+
+    def __init__(self, client: AsyncMongoClient, delegate: pymongo.cursor.Cursor):
+        self.client = client
+        self.delegate = delegate
+        self._buffer = []
+        self._exhausted = False
+
+    def sort(self, *args, **kwargs) -> 'AsyncCursor':
+        self.delegate.sort(*args, **kwargs)
+        return self
+
+    def limit(self, *args, **kwargs) -> 'AsyncCursor':
+        self.delegate.limit(*args, **kwargs)
+        return self
+
+    def skip(self, *args, **kwargs) -> 'AsyncCursor':
+        self.delegate.skip(*args, **kwargs)
+        return self
+
+    def _next_batch(self) -> list:
+        batch = []
+        for document in self.delegate:
+            batch.append(document)
+            if len(batch) >= self.BATCH_SIZE:
+                break
+
+        return batch
+
+    async def to_list(self, length: typing.Optional[int] = None) -> list:
+        if length is not None:
+            self.delegate.limit(length)
+
+        return await self.client.run(list, self.delegate)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._buffer:
+            if self._exhausted:
+                raise StopAsyncIteration
+
+            self._buffer = await self.client.run(self._next_batch)
+            self._buffer.reverse()  # Pop from the end for O(1) retrieval
+            if len(self._buffer) < self.BATCH_SIZE:
+                self._exhausted = True
+
+            if not self._buffer:
+                raise StopAsyncIteration
+
+        return self._buffer.pop()
+
+
+class BufferedWriter:
+    '''
+    Write-behind buffer for high volume inserts. Documents are held in memory and written with unordered
+    `insert_many` once `batch_size` documents are waiting or `interval` seconds have passed, whichever is first.
+    At most `max_pending` documents are held; if the database is unreachable for long enough to exceed that the oldest
+    documents are dropped rather than growing without bound. Documents must have an `_id` so that they can be looked
+    up and amended while still pending. Coroutines in `hooks` are awaited with each batch once it has been written.
+    '''
+
+    def __init__(
+        self,
+        collection: AsyncCollection,
+        batch_size: int = 500,
+        interval: float = 2.0,
+        max_pending: int = 50000,
+        retries: int = 3,
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.retries = retries
+
+        self.pending: typing.Dict[typing.Any, dict] = {}
+        self.retried: typing.Set[typing.Any] = set()  # _ids of requeued documents, which may already have landed
+        self.hooks: typing.List[typing.Callable[[list], typing.Awaitable]] = []
+        self.stats = {
+            'inserted': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'dropped': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+        }
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+
+    def start(self):
+        if not self._task:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        '''Stop the background flusher and write out everything still pending'''
+        if self._task:
+            # Let a flush that is already writing finish rather than cancelling it with its batch out of `pending`
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+        if self.pending:
+            logging.error(
+                f'[Database] {len(self.pending)} buffered writes to {self.collection.delegate.name} were lost'
+            )
+
+    def add(self, document: dict):
+        if len(self.pending) >= self.max_pending:
+            oldest = next(iter(self.pending))
+            del self.pending[oldest]
+            self.retried.discard(oldest)
+            self.stats['dropped'] += 1
+
+        self.pending[document['_id']] = document
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def update_pending(self, _id, fields: dict) -> typing.Optional[dict]:
+        '''Apply `fields` to a document that has not been written yet. Returns the document, or None if not pending'''
+        document = self.pending.get(_id)
+        if document is not None:
+            document.update(fields)
+
+        return document
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            try:
+                await self.flush()
+
+            except Exception as e:
+                logging.error(f'[Database] Unexpected error flushing {self.collection.delegate.name}: {e}')
+
+    async def flush(self):
+        async with self._lock:
+            while self.pending:
+                batch = list(self.pending.values())[: self.batch_size]
+                for document in batch:
+                    del self.pending[document['_id']]
+
+                try:
+                    succeeded = await self._write(batch)
+
+                except asyncio.CancelledError:
+                    self.pending = {**{document['_id']: document for document in batch}, **self.pending}
+                    raise
+
+                if not succeeded:
+                    # Requeue ahead of anything that arrived since, then wait for the next interval to retry
+                    self.pending = {**{document['_id']: document for document in batch}, **self.pending}
+                    self.retried.update(document['_id'] for document in batch)
+                    self.stats['failed_flushes'] += 1
+                    return
+
+    async def _write(self, batch: list) -> bool:
+        for attempt in range(self.retries):
+            start = time.perf_counter()
+            written = batch
+            try:
+                await self.collection.insert_many(batch, ordered=False)
+
+            except pymongo.errors.BulkWriteError as e:
+                # On a retry, duplicate keys mean an earlier attempt partially landed, so those documents still count
+                # towards the hooks. Otherwise they were written by someone else, who has already counted them
+                errors = [error for error in e.details['writeErrors'] if error['code'] != 11000]
+                failed = {
+                    error['index']
+                    for error in e.details['writeErrors']
+                    if error['code'] != 11000 or not (attempt or batch[error['index']]['_id'] in self.retried)
+                }
+                written = [document for index, document in enumerate(batch) if index not in failed]
+                if errors:
+                    logging.error(f'[Database] {len(errors)} documents rejected by {self.collection.delegate.name}')
+
+            except pymongo.errors.PyMongoError as e:
+                logging.warning(
+                    f'[Database] Flush to {self.collection.delegate.name} failed, attempt {attempt + 1}: {e}'
+                )
+                await asyncio.sleep(2**attempt)
+                continue
+
+            self.retried.difference_update(document['_id'] for document in batch)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stats['inserted'] += len(written)
+            self.stats['flushes'] += 1
+            self.stats['last_flush_ms'] = elapsed
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed)
+
+            for hook in self.hooks:
+                try:
+                    await hook(written)
+
+                except Exception as e:
+                    logging.error(
+                        f'[Database] Flush hook {hook.__name__} failed for {self.collection.delegate.name}: {e}'
+                    )
+
+            return True
+
+        return False
+
+
+def client(name: str = 'default') -> AsyncMongoClient:
+    '''
+    Return the shared client registered under `name`, creating it on first use. Extensions should always obtain their
+    client from here rather than constructing their own so that the whole bot uses a single connection pool. Because
+    this module is not an extension it is not re-imported by `reload_extension`, so the pool survives hot reloads.
+    '''
+    if name not in _clients:
+        options = {**getattr(config, 'mongoOptions', {}), **CLIENT_OPTIONS.get(name, {})}
+        workers = getattr(config, 'mongoExecutorWorkers', 16)
+        _clients[name] = AsyncMongoClient(config.mongoURI, executor_workers=workers, **options)
+        logging.info(f'[Database] Opened MongoDB client "{name}"')
+
+    return _clients[name]
+
+
+def close_all():
+    '''Close every registered client, called once when the bot shuts down'''
+    while _clients:
+        _, mongoClient = _clients.popitem()
+        mongoClient.close()
+
+
+async def ensure_indexes(mongoClient: AsyncMongoClient) -> typing.Dict[str, typing.List[str]]:
+    '''
+    Create any index from `INDEXES` that does not exist yet and look for indexes which have not been used since the
+    server last started. Returns a dict with `created`, `failed` and `unused` lists of "db.collection: index" strings.
+    '''
+    report = {'created': [], 'failed': [], 'unused': []}
+    for (dbName, colName), models in INDEXES.items():
+        collection = mongoClient[dbName][colName]
+        created = []
+        try:
+            existing = {tuple(info['key']) for info in (await collection.index_information()).values()}
+
+        except pymongo.errors.PyMongoError as e:
+            report['failed'].append(f'{dbName}.{colName}: all indexes ({e})')
+            logging.error(f'[Database] Unable to read indexes of {dbName}.{colName}: {e}')
+            continue
+
+        for model in models:
+            keys = tuple(model.document['key'].items())
+            if keys in existing:
+                continue
+
+            model.document.setdefault('background', True)  # Don't hold locks for the build on older servers
+            try:
+                name = (await collection.create_indexes([model]))[0]
+                created.append(name)
+                report['created'].append(f'{dbName}.{colName}: {name}')
+                logging.info(f'[Database] Created index {name} on {dbName}.{colName}')
+
+            except pymongo.errors.PyMongoError as e:  # Log and carry on with the rest of the manifest
+                details = getattr(e, 'details', None) or {}
+                report['failed'].append(f'{dbName}.{colName}: {model.document["name"]} ({details.get("errmsg", e)})')
+                logging.error(f'[Database] Failed to create index {model.document["name"]} on {dbName}.{colName}: {e}')
+
+        try:
+            stats = await collection.aggregate([{'$indexStats': {}}])
+
+        except pymongo.errors.PyMongoError:  # $indexStats requires the indexStats privilege
+            continue
+
+        for stat in stats:
+            if stat['name'] not in ['_id_', *created] and not stat['accesses']['ops']:
+                report['unused'].append(f'{dbName}.{colName}: {stat["name"]}')
+
+    return report
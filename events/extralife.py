@@ -5,11 +5,11 @@ from typing import List
 
 import config
 import discord
-import pymongo
 import requests
 from discord import app_commands
 from discord.ext import commands, tasks
 
+import database
 import tools
 
 
@@ -45,7 +45,7 @@ class ExtraLife(commands.Cog):
 
         ################################################################################################################################
 
-        self.mclient = pymongo.MongoClient(config.mongoURI)
+        self.mclient = database.client()
         self.bot = bot
         self.guild = self.bot.get_guild(self.GUILD)
         self.chatRole = self.guild.get_role(self.CHAT_ROLE)
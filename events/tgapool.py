@@ -4,13 +4,13 @@ from datetime import datetime
 import aiohttp
 import config
 import discord
-import pymongo
 from discord import app_commands
 from discord.ext import commands, tasks
 
+import database
 from tools import commit_profile_change
 
-mclient = pymongo.MongoClient(config.mongoURI)
+mclient = database.client()
 
 
 class TGAPool(commands.Cog):
@@ -40,7 +40,7 @@ class TGAPool(commands.Cog):
             async with session.get(self.ENDPOINT, headers=headers) as resp:
                 users = await resp.json()
                 for user in users:
-                    dbUser = self.db.find_one(int(user['id']))
+                    dbUser = await self.db.find_one(int(user['id']))
 
                     if not user['earnedTrophy'] or not dbUser:
                         continue
@@ -52,7 +52,7 @@ class TGAPool(commands.Cog):
                         continue
 
                     if trophy_name not in dbUser['trophies']:
-                        self.db.update_one({'_id': int(user['id'])}, {'$push': {'trophies': trophy_name}})
+                        await self.db.update_one({'_id': int(user['id'])}, {'$push': {'trophies': trophy_name}})
 
                         msg = f':information_source: Assigned TGA trophy `{trophy_name}` to <@{user["id"]}>'
                         await interaction.followup.send(msg, allowed_mentions=discord.AllowedMentions.none())
@@ -70,7 +70,7 @@ class TGAPool(commands.Cog):
             async with session.get(self.ENDPOINT, headers=headers) as resp:
                 users = await resp.json()
                 for user in users:
-                    dbUser = self.db.find_one(int(user['id']))
+                    dbUser = await self.db.find_one(int(user['id']))
 
                     if not user['earnedBackground'] or not dbUser:
                         continue
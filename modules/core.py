@@ -1,9 +1,10 @@
 import asyncio
 import collections
+import contextlib
 import logging
 import time
 import typing
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 import config  # type: ignore
 import discord
@@ -11,10 +12,13 @@ import pymongo
 from discord import app_commands
 from discord.ext import commands, tasks
 
+import database  # type: ignore
 import tools  # type: ignore
 
 startTime = int(time.time())
-mclient = pymongo.MongoClient(config.mongoURI)
+mclient = database.client()
+
+CACHE_SYNC_CONCURRENCY = 4  # Channels crawled at once by /update cache
 
 
 class MainEvents(commands.Cog):
@@ -22,6 +26,11 @@ class MainEvents(commands.Cog):
         self.bot = bot
         self.serverLogQueue = []
         self.serverLogLastSend = time.time()
+        self.messageWriter = database.BufferedWriter(mclient.bowser.messages)
+        self.messageWriter.hooks.append(tools.rollup_messages)
+        self.messageWriter.hooks.append(tools.record_user_activity)
+        self.cacheSyncTask = None
+        self.userActivityTask = None
 
     async def cog_load(self):
         logging.info('[Core] Waiting for guild caches to chunk...')
@@ -43,6 +52,7 @@ class MainEvents(commands.Cog):
 
         # self.sanitize_eud.start()  # pylint: disable=no-member
         self.run_process_logs.start()
+        self.messageWriter.start()
 
         self.serverLogs = self.bot.get_channel(config.logChannel)
         self.modLogs = self.bot.get_channel(config.modChannel)
@@ -52,10 +62,10 @@ class MainEvents(commands.Cog):
 
         # Automod is hard coded to this guild, so to reduce confusion, we only init configured guild.
         guild_db = mclient.bowser.guilds
-        guild = guild_db.find_one({'_id': config.nintendoswitch})
+        guild = await guild_db.find_one({'_id': config.nintendoswitch})
 
         if not guild:
-            guild_db.insert_one(
+            await guild_db.insert_one(
                 {
                     "_id": config.nintendoswitch,
                     "inviteWhitelist": [config.nintendoswitch],
@@ -64,16 +74,42 @@ class MainEvents(commands.Cog):
                 }
             )
 
+        self.bot.loop.create_task(self.verify_indexes())
+
     async def cog_unload(self):
         self.run_process_logs.cancel()
+        await self.messageWriter.close()
+        if self.cacheSyncTask:
+            self.cacheSyncTask.cancel()  # Progress is checkpointed, a later run will resume
 
     # self.sanitize_eud.cancel()  # pylint: disable=no-member
 
+    async def verify_indexes(self):
+        logging.info('[Core] Verifying database indexes')
+        try:
+            # Index builds on large collections outlast the default client's socket timeout
+            report = await database.ensure_indexes(database.client('maintenance'))
+
+        except Exception as e:
+            logging.error(f'[Core] Unable to verify database indexes: {e}')
+            return await self.debugChannel.send(f'{config.redTick} Unable to verify database indexes: `{e}`')
+
+        logging.info(
+            f'[Core] Index verification finished. {len(report["created"])} created, {len(report["failed"])} failed, {len(report["unused"])} unused'
+        )
+        lines = []
+        for key, heading in [('created', 'Created missing'), ('failed', 'Failed to create'), ('unused', 'Unused')]:
+            if report[key]:
+                lines.append(f'**{heading} indexes:**\n' + '\n'.join(f'`{index}`' for index in report[key]))
+
+        if lines:
+            await self.debugChannel.send(':information_source: Database index report\n\n' + '\n\n'.join(lines)[:1900])
+
     @tasks.loop(hours=24)
     async def sanitize_eud(self):
         logging.info('[Core] Starting sanitzation of old EUD')
         msgDB = mclient.bowser.messages
-        msgDB.update_many(
+        await msgDB.update_many(
             {
                 'timestamp': {"$lte": time.time() - (86400 * 365)},
                 'sanitized': False,
@@ -149,19 +185,51 @@ class MainEvents(commands.Cog):
         roundtrip = (msg.created_at - initiated).total_seconds() * 1000
 
         database_start = time.time()
-        mclient.bowser.command('ping')
+        await mclient.bowser.command('ping')
         database = (time.time() - database_start) * 1000
 
         websocket = self.bot.latency * 1000
+        writer = self.messageWriter
+
+        content = (
+            'Pong! Latency: **Roundtrip** `{:1.0f}ms`, **Websocket** `{:1.0f}ms`, **Database** `{:1.0f}ms`\n'
+            'Message writes: **Queued** `{}`, **Last flush** `{:1.0f}ms`, **Slowest flush** `{:1.0f}ms`, **Dropped** `{}`'.format(
+                roundtrip,
+                websocket,
+                database,
+                len(writer.pending),
+                writer.stats['last_flush_ms'],
+                writer.stats['max_flush_ms'],
+                writer.stats['dropped'],
+            )
+        )
 
-        return await msg.edit(
-            content=(
-                'Pong! Latency: **Roundtrip** `{:1.0f}ms`, **Websocket** `{:1.0f}ms`, **Database** `{:1.0f}ms`'.format(
-                    roundtrip, websocket, database
+        socialCog = self.bot.get_cog('Social Commands')
+        if socialCog:
+            scheduler = socialCog.renderScheduler
+            content += (
+                '\nProfile renders: **Running** `{}`, **Queued** `{}`, **Last wait** `{:1.0f}ms`, **Longest wait** `{:1.0f}ms`, '
+                '**Last render** `{:1.0f}ms`, **Coalesced** `{}`'.format(
+                    scheduler.running,
+                    scheduler.queued,
+                    scheduler.stats['last_wait_ms'],
+                    scheduler.stats['max_wait_ms'],
+                    scheduler.stats['last_render_ms'],
+                    scheduler.stats['coalesced'],
                 )
             )
+
+        autocomplete = tools.autocompleter.stats
+        content += '\nAutocomplete: **Requests** `{}`, **In time** `{}`, **Cached** `{}`, **Superseded** `{}`, **Late** `{}`'.format(
+            autocomplete['requests'],
+            autocomplete['answered'],
+            autocomplete['cached'],
+            autocomplete['superseded'],
+            autocomplete['late'],
         )
 
+        return await msg.edit(content=content)
+
     @app_commands.command(name='treesync')
     @app_commands.guilds(discord.Object(id=config.nintendoswitch))
     @app_commands.default_permissions(view_audit_log=True)
@@ -192,7 +260,7 @@ class MainEvents(commands.Cog):
             return
 
         # Add to database
-        mclient.bowser.users.update_one(
+        await mclient.bowser.users.update_one(
             {'_id': member.id},
             {
                 '$push': {
@@ -225,20 +293,23 @@ class MainEvents(commands.Cog):
     @commands.Cog.listener()
     async def on_member_join(self, member):
         db = mclient.bowser.users
-        doc = db.find_one({'_id': member.id})
+        doc = await db.find_one({'_id': member.id})
         roleList = []
         restored = False
+        joined = int(datetime.now(tz=timezone.utc).timestamp())
 
         if not doc:
             await tools.store_user(member)
-            doc = db.find_one({'_id': member.id})
+            doc = await db.find_one({'_id': member.id})
 
         else:
-            db.update_one(
+            await db.update_one(
                 {'_id': member.id},
-                {'$push': {'joins': int(datetime.now(tz=timezone.utc).timestamp())}},
+                {'$push': {'joins': joined}},
             )
 
+        await mclient.bowser.member_flow.insert_one({'user': member.id, 'type': 'join', 'timestamp': joined})
+
         new = (
             ':new: ' if (datetime.now(tz=timezone.utc) - member.created_at).total_seconds() <= 60 * 60 * 24 * 14 else ''
         )  # Two weeks
@@ -273,16 +344,15 @@ class MainEvents(commands.Cog):
             await member.edit(roles=roleList, reason='Automatic role restore action')
 
         punDB = mclient.bowser.puns
-        if needsRestore or punDB.find_one({'user': member.id, 'type': 'mute', 'active': True}):
+        if needsRestore or await punDB.find_one({'user': member.id, 'type': 'mute', 'active': True}):
             punTypes = {
                 'mute': 'Mute',
                 'blacklist': 'Channel Blacklist ({})',
             }
             restoredPuns = []
             query = {'user': member.id, 'active': True}
-            if punDB.count_documents(query):
-                puns = punDB.find(query)
-                for x in puns:
+            if await punDB.count_documents(query):
+                async for x in punDB.find(query):
                     if x['type'] == 'blacklist':
                         restoredPuns.append(punTypes[x['type']].format(x['context']))
 
@@ -331,10 +401,12 @@ class MainEvents(commands.Cog):
             embed.add_field(name='Mention', value=f'<@{member.id}>')
             await self.serverLogs.send(':shield: Member restored', embed=embed)
 
-        if punDB.count_documents({'user': member.id, 'active': True, 'type': {'$in': ['mute', 'strike', 'blacklist']}}):
+        if await punDB.count_documents(
+            {'user': member.id, 'active': True, 'type': {'$in': ['mute', 'strike', 'blacklist']}}
+        ):
             activeHist = []
             strikes = 0
-            for pun in punDB.find(
+            async for pun in punDB.find(
                 {'user': member.id, 'active': True, 'type': {'$in': ['mute', 'strike', 'blacklist']}}
             ):
                 if pun['type'] == 'strike':
@@ -356,12 +428,12 @@ class MainEvents(commands.Cog):
         if (
             'migrate_unnotified' in doc.keys() and doc['migrate_unnotified'] == True
         ):  # Migration of warnings to strikes for returning members
-            for pun in punDB.find(
+            async for pun in punDB.find(
                 {'active': True, 'type': {'$in': ['tier1', 'tier2', 'tier3']}, 'user': member.id}
             ):  # Should only be one, it's mutually exclusive
                 strikeCount = int(pun['type'][-1:]) * 4
 
-                punDB.update_one({'_id': pun['_id']}, {'$set': {'active': False}})
+                await punDB.update_one({'_id': pun['_id']}, {'$set': {'active': False}})
 
                 explanation = (
                     'Hello there **{}**,\nI am letting you know of a change in status for your active level {} warning issued on {}.\n\n'
@@ -396,7 +468,7 @@ class MainEvents(commands.Cog):
                     public=False,
                     public_notify=public_notify,
                 )
-                db.update_one(
+                await db.update_one(
                     {'_id': member.id},
                     {'$set': {'migrate_unnotified': False, 'strike_check': time.time() + (60 * 60 * 24 * 7)}},
                 )  # Setting the next expiry check time
@@ -406,14 +478,16 @@ class MainEvents(commands.Cog):
     @commands.Cog.listener()
     async def on_member_remove(self, member):
         db = mclient.bowser.puns
+        left = int(datetime.now(tz=timezone.utc).timestamp())
 
-        mclient.bowser.users.update_one(
+        await mclient.bowser.users.update_one(
             {'_id': member.id},
-            {'$push': {'leaves': int(datetime.now(tz=timezone.utc).timestamp())}},
+            {'$push': {'leaves': left}},
         )
+        await mclient.bowser.member_flow.insert_one({'user': member.id, 'type': 'leave', 'timestamp': left})
         query = {'user': member.id, 'active': True, 'type': {'$in': ['strike', 'mute', 'blacklist']}}
-        if db.count_documents(query):
-            puns = db.find(query)
+        if await db.count_documents(query):
+            puns = await db.find(query).to_list()
             embed = discord.Embed(
                 description=f'{member} ({member.id}) left the server\n\n:warning: __**User had active punishments**__ :warning:',
                 color=0xD62E44,
@@ -445,7 +519,9 @@ class MainEvents(commands.Cog):
 
         db = mclient.bowser.puns
         await asyncio.sleep(10)  # Wait 10 seconds to allow audit log to update
-        if not db.find_one({'user': user.id, 'type': 'ban', 'active': True, 'timestamp': {'$gt': time.time() - 60}}):
+        if not await db.find_one(
+            {'user': user.id, 'type': 'ban', 'active': True, 'timestamp': {'$gt': time.time() - 60}}
+        ):
             # Manual ban
             audited = None
             async for entry in guild.audit_logs(action=discord.AuditLogAction.ban):
@@ -473,7 +549,7 @@ class MainEvents(commands.Cog):
             return
 
         db = mclient.bowser.puns
-        if not db.find_one({'user': user.id, 'type': 'unban', 'timestamp': {'$gt': time.time() - 60}}):
+        if not await db.find_one({'user': user.id, 'type': 'unban', 'timestamp': {'$gt': time.time() - 60}}):
             # Manual unban
 
             audited = None
@@ -488,7 +564,9 @@ class MainEvents(commands.Cog):
 
                 reason = audited.reason or '-No reason specified-'
                 docID = await tools.issue_pun(audited.target.id, audited.user.id, 'unban', reason, active=False)
-                db.update_one({'user': audited.target.id, 'type': 'ban', 'active': True}, {'$set': {'active': False}})
+                await db.update_one(
+                    {'user': audited.target.id, 'type': 'ban', 'active': True}, {'$set': {'active': False}}
+                )
 
                 await tools.send_modlog(
                     self.bot, self.modLogs, 'unban', docID, reason, user=user, moderator=audited.user, public=True
@@ -520,7 +598,6 @@ class MainEvents(commands.Cog):
             logging.debug(f'Discarding non guild message {message.channel.type} {message.id}')
             return
 
-        db = mclient.bowser.messages
         timestamp = int(time.time())
         obj = {
             '_id': message.id,
@@ -537,7 +614,7 @@ class MainEvents(commands.Cog):
         if issubclass(message.channel.__class__, discord.Thread):
             obj['parent_channel'] = message.channel.parent_id
 
-        db.insert_one(obj)
+        self.messageWriter.add(obj)
 
         await self.bot.process_commands(message)  # Allow commands to fire
         return
@@ -549,17 +626,21 @@ class MainEvents(commands.Cog):
             return
 
         await asyncio.sleep(10)  # Give chance for clean command to finish and discord to process delete
-        mclient.bowser.messages.update_many({'_id': {'$in': [m.id for m in messages]}}, {'$set': {'deleted': True}})
+        for m in messages:
+            self.messageWriter.update_pending(m.id, {'deleted': True})
+
+        await mclient.bowser.messages.update_many(
+            {'_id': {'$in': [m.id for m in messages]}}, {'$set': {'deleted': True}}
+        )
 
         db = mclient.bowser.archive
         checkStamp = int(
             time.time() - 600
         )  # Rate limiting, instability, and being just slow to fire are other factors that could delay the event
-        archives = db.find({'timestamp': {'$gt': checkStamp}})
-        if archives:  # If the bulk delete is the result of us, exit
-            for x in archives:
-                if messages[0].id in x['messages']:
-                    return
+        # If the bulk delete is the result of us, exit
+        async for x in db.find({'timestamp': {'$gt': checkStamp}}):
+            if messages[0].id in x['messages']:
+                return
 
         archiveID = await tools.message_archive(messages)
 
@@ -573,9 +654,11 @@ class MainEvents(commands.Cog):
     @commands.Cog.listener()
     async def on_raw_message_delete(self, payload):
         db = mclient.bowser.messages
-        dbMessage = db.find_one_and_update(
-            {'_id': payload.message_id, 'channel': payload.channel_id}, {'$set': {'deleted': True}}
-        )
+        dbMessage = self.messageWriter.update_pending(payload.message_id, {'deleted': True})
+        if not dbMessage:
+            dbMessage = await db.find_one_and_update(
+                {'_id': payload.message_id, 'channel': payload.channel_id}, {'$set': {'deleted': True}}
+            )
         if payload.cached_message:
             if (
                 payload.cached_message.type not in [discord.MessageType.default, discord.MessageType.reply]
@@ -608,7 +691,7 @@ class MainEvents(commands.Cog):
                 )
                 return
 
-            dbUser = db.find_one({'_id': dbMessage['author']})
+            dbUser = await db.find_one({'_id': dbMessage['author']})
             if not dbUser or not dbUser['nameHist']:
                 # The user either isn't in the database (unlikely) or we have no prior names recorded
                 user = {'author_field': f'{dbMessage['author']}', 'author_id': dbMessage['author'], 'author_icon': None}
@@ -698,7 +781,7 @@ class MainEvents(commands.Cog):
     async def on_member_update(self, before, after):
         userCol = mclient.bowser.users
         if before.display_name != after.display_name:
-            userCol.update_one(
+            await userCol.update_one(
                 {'_id': before.id},
                 {
                     '$push': {
@@ -742,7 +825,7 @@ class MainEvents(commands.Cog):
                     roleList.append(x.id)
                 roleStr.append(x.name)
 
-            userCol.update_one({'_id': before.id}, {'$set': {'roles': roleList}})
+            await userCol.update_one({'_id': before.id}, {'$set': {'roles': roleList}})
 
             beforeCounter = collections.Counter(before.roles)
             afterCounter = collections.Counter(after.roles)
@@ -782,7 +865,7 @@ class MainEvents(commands.Cog):
             after_name = discord.utils.escape_markdown(str(after))
             userCol = mclient.bowser.users
 
-            userCol.update_one(
+            await userCol.update_one(
                 {'_id': before.id},
                 {
                     '$push': {
@@ -806,10 +889,10 @@ class MainEvents(commands.Cog):
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role):
         db = mclient.bowser.users
-        for user in db.find({'roles': {'$in': [role.id]}}):
+        async for user in db.find({'roles': {'$in': [role.id]}}):
             storedRoles = user['roles']
             storedRoles.remove(role.id)
-            db.update_one({'_id': user['_id']}, {'$set': {'roles': storedRoles}})
+            await db.update_one({'_id': user['_id']}, {'$set': {'roles': storedRoles}})
 
     @app_commands.guilds(discord.Object(id=config.nintendoswitch))
     @app_commands.default_permissions(manage_guild=True)
@@ -846,7 +929,7 @@ class MainEvents(commands.Cog):
         guild = self.bot.get_guild(config.nintendoswitch)
 
         for member in guild.members:
-            doc = db.find_one({'_id': member.id})
+            doc = await db.find_one({'_id': member.id})
             if not doc:
                 await tools.store_user(member)
                 continue
@@ -859,7 +942,7 @@ class MainEvents(commands.Cog):
             if roleList == doc['roles']:
                 continue
 
-            db.update_one({'_id': member.id}, {'$set': {'roles': roleList}})
+            await db.update_one({'_id': member.id}, {'$set': {'roles': roleList}})
         logging.info('[Core] User database syncronization complete')
         return await interaction.followup.send('Done.')
 
@@ -867,32 +950,139 @@ class MainEvents(commands.Cog):
         name='cache', description='Update the database message cache for the entire server. API and resource intensive'
     )
     async def _update_cache(self, interaction: discord.Interaction):
-        funcStart = time.time()
-        logging.info('[Core] Starting db message sync')
-        await interaction.send_message(
-            'Starting syncronization of db for all messages in server. This will take a conciderable amount of time.'
+        if self.cacheSyncTask and not self.cacheSyncTask.done():
+            return await interaction.response.send_message(
+                f'{config.redTick} A message cache syncronization is already running', ephemeral=True
+            )
+
+        await interaction.response.send_message(
+            'Starting syncronization of db for all messages in server. This will take a conciderable amount of time. '
+            'Channels resume from where any previous run left off'
+        )
+        # Because this will definitely exceed the interaction expiry, progress is reported with a regular message
+        status = await interaction.channel.send(f'{config.loading} Preparing message cache syncronization')
+        self.cacheSyncTask = self.bot.loop.create_task(
+            self.sync_message_cache(interaction.guild, status, interaction.user)
         )
 
-        for channel in interaction.guild.channels:
-            if not issubclass(channel.__class__, discord.abc.Messageable):
-                continue
+    @update_group.command(name='activity', description='Rebuild daily activity statistics from the message cache')
+    @app_commands.describe(
+        start='The first day to rebuild, in YYYY-MM-DD format. Defaults to the oldest stored message'
+    )
+    async def _update_activity(self, interaction: discord.Interaction, start: typing.Optional[str] = None):
+        await interaction.response.defer()
+        if start:
+            try:
+                day = datetime.strptime(start, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+            except ValueError:
+                return await interaction.followup.send(
+                    f'{config.redTick} Invalid date provided. Please make sure it is in the format of `yyyy-mm-dd`'
+                )
 
-            # Because this will definitely exceed the interaction expiry, send messages to the channel directly
-            await interaction.channel.send(f'Starting syncronization for <#{channel.id}>')
+        else:
+            oldest = await mclient.bowser.messages.find({}, {'timestamp': 1}).sort('timestamp', 1).to_list(1)
+            if not oldest:
+                return await interaction.followup.send(f'{config.redTick} There are no stored messages to rebuild from')
+
+            day = datetime.fromtimestamp(oldest[0]['timestamp'], tz=timezone.utc)
+
+        day = day.replace(hour=0, minute=0, second=0, microsecond=0)
+        today = datetime.now(tz=timezone.utc)
+        totalDays = (today - day).days + 1
+        logging.info(f'[Core] Rebuilding activity rollups for {totalDays} days')
+        await interaction.followup.send(f'Rebuilding activity statistics for {totalDays} days')
+        # This can exceed the interaction expiry, so report progress with a regular message
+        status = await interaction.channel.send(f'{config.loading} Rebuilding activity statistics...')
+
+        done = 0
+        while day <= today:
+            await tools.rebuild_activity_rollup(day.strftime('%Y-%m-%d'))
+            day += timedelta(days=1)
+            done += 1
+            if not done % 30:
+                await status.edit(content=f'{config.loading} Rebuilding activity statistics... {done}/{totalDays} days')
+
+        logging.info('[Core] Activity rollup rebuild complete')
+        return await status.edit(content=f'{config.greenTick} Rebuilt activity statistics for {totalDays} days')
+
+    @update_group.command(name='useractivity', description='Rebuild per-user message totals from the message cache')
+    async def _update_user_activity(self, interaction: discord.Interaction):
+        if self.userActivityTask and not self.userActivityTask.done():
+            return await interaction.response.send_message(
+                f'{config.redTick} A user activity rebuild is already running', ephemeral=True
+            )
 
-            try:
-                x, y = await self.store_message_cache(channel)
-                await interaction.channel.send(
-                    f'Syncronized <#{channel.id}>. Processed {x} messages and recorded meta data for {y} messages'
+        await interaction.response.send_message('Starting rebuild of user activity summaries')
+        # The rebuild can outlast the interaction expiry, so the result is reported with a regular message
+        status = await interaction.channel.send(f'{config.loading} Rebuilding user activity summaries')
+        self.userActivityTask = self.bot.loop.create_task(self.rebuild_user_activity(status, interaction.user))
+
+    async def rebuild_user_activity(self, status: discord.Message, user: discord.abc.User):
+        logging.info('[Core] Rebuilding user activity summaries')
+        start = time.time()
+        try:
+            await tools.rebuild_user_activity()
+
+        except pymongo.errors.PyMongoError as e:
+            logging.error(f'[Core] User activity rebuild failed: {e}')
+            await status.edit(content=f'{config.redTick} Rebuilding user activity summaries failed: `{e}`')
+            return await status.channel.send(f'<@{user.id}> User activity rebuild failed')
+
+        timeToComplete = tools.humanize_duration(tools.resolve_duration(f'{int(time.time() - start)}s'))
+        logging.info('[Core] User activity rebuild complete')
+        await status.edit(content=f'{config.greenTick} Rebuilt user activity summaries')
+        return await status.channel.send(f'<@{user.id}> User activity rebuild completed. Took {timeToComplete}')
+
+    @update_group.command(name='memberflow', description='Backfill the join and leave log from member records')
+    async def _update_member_flow(self, interaction: discord.Interaction):
+        await interaction.response.defer()
+        logging.info('[Core] Starting member flow backfill')
+        db = mclient.bowser.member_flow
+
+        # Only events older than the log itself are copied. The cutoff is recorded by the first run and reused, so a
+        # run that failed part way can be repeated; the unique index skips any events it already copied
+        status = await mclient.bowser.sync_status.find_one({'_id': 'member_flow'})
+        if status:
+            cutoff = status['cutoff']
+
+        else:
+            oldest = await db.find({}, {'timestamp': 1}).sort('timestamp', 1).to_list(1)
+            cutoff = oldest[0]['timestamp'] if oldest else time.time()
+            await mclient.bowser.sync_status.insert_one({'_id': 'member_flow', 'cutoff': cutoff, 'complete': False})
+
+        events = []
+        inserted = 0
+        async for user in mclient.bowser.users.find({'joins': {'$ne': []}}, {'joins': 1, 'leaves': 1}):
+            for key, _type in [('joins', 'join'), ('leaves', 'leave')]:
+                events.extend(
+                    {'user': user['_id'], 'type': _type, 'timestamp': x} for x in user.get(key, []) if x < cutoff
                 )
 
-            except (discord.Forbidden, discord.HTTPException):
-                await interaction.channel.send(f'Failed to syncronize <#{channel.id}>')
+            if len(events) >= 1000:
+                inserted += await self._insert_member_flow(events)
+                events = []
 
-        timeToComplete = tools.humanize_duration(tools.resolve_duration(f'{int(time.time() - funcStart)}s'))
-        return await interaction.channel.send(
-            f'<@{interaction.user.id}> Syncronization completed. Took {timeToComplete}'
-        )
+        if events:
+            inserted += await self._insert_member_flow(events)
+
+        await mclient.bowser.sync_status.update_one({'_id': 'member_flow'}, {'$set': {'complete': True}})
+        logging.info(f'[Core] Member flow backfill complete, {inserted} events added')
+        return await interaction.followup.send(f'{config.greenTick} Added {inserted:,} join and leave events')
+
+    @staticmethod
+    async def _insert_member_flow(events: list) -> int:
+        try:
+            await mclient.bowser.member_flow.insert_many(events, ordered=False)
+
+        except pymongo.errors.BulkWriteError as e:
+            # Events copied by an earlier run are duplicate keys, anything else is a real failure
+            if any(error['code'] != 11000 for error in e.details['writeErrors']):
+                raise
+
+            return e.details['nInserted']
+
+        return len(events)
 
     @update_group.command(name='gamedb', description='Fetch games database updates from DekuDeals')
     @app_commands.default_permissions(view_audit_log=True)
@@ -907,31 +1097,130 @@ class MainEvents(commands.Cog):
         await interaction.response.send_message('Closing connection to discord and shutting down')
         return await self.bot.close()
 
-    async def store_message_cache(self, channel):
-        # users = mclient.bowser.users
+    async def sync_message_cache(self, guild: discord.Guild, status: discord.Message, user: discord.abc.User):
+        funcStart = time.time()
+        logging.info('[Core] Starting db message sync')
+        channels = [c for c in guild.channels if issubclass(c.__class__, discord.abc.Messageable)]
+        progress = {'channels': 0, 'processed': 0, 'recorded': 0, 'failed': []}
+        semaphore = asyncio.Semaphore(CACHE_SYNC_CONCURRENCY)
+
+        async def crawl(channel):
+            async with semaphore:
+                try:
+                    x, y = await self.store_message_cache(channel, progress)
+
+                except Exception as e:  # One channel failing, i.e. on a database error, must not abort the rest
+                    progress['failed'].append(channel.id)
+                    logging.error(f'[Core] Failed to syncronize message cache for {channel.id}: {e}')
+
+                else:
+                    logging.info(f'[Core] Syncronized {channel.id}. Processed {x} messages, recorded {y}')
+
+                progress['channels'] += 1
+
+        async def report():
+            while True:
+                await asyncio.sleep(15)
+                with contextlib.suppress(discord.HTTPException):
+                    await status.edit(
+                        content=f'{config.loading} Syncronizing message cache. {progress["channels"]}/{len(channels)} channels done, '
+                        f'{progress["processed"]:,} messages processed and {progress["recorded"]:,} recorded'
+                    )
+
+        reporter = self.bot.loop.create_task(report())
+        try:
+            await asyncio.gather(*[crawl(channel) for channel in channels])
+
+        finally:
+            reporter.cancel()
+
+            # Always report back, a cancelled run (i.e. on cog unload) resumes from its checkpoints next time
+            timeToComplete = tools.humanize_duration(tools.resolve_duration(f'{int(time.time() - funcStart)}s'))
+            failed = ', '.join(f'<#{c}>' for c in progress['failed'])
+            finished = progress['channels'] == len(channels)
+            with contextlib.suppress(discord.HTTPException):
+                await status.edit(
+                    content=(
+                        f'{config.greenTick} Syncronized {len(channels)} channels. '
+                        if finished
+                        else f'{config.redTick} Syncronization interrupted after {progress["channels"]}/{len(channels)} channels. '
+                    )
+                    + f'{progress["processed"]:,} messages processed and {progress["recorded"]:,} recorded'
+                    + (f'\nFailed to syncronize: {failed}' if failed else '')
+                )
+                await status.channel.send(
+                    f'<@{user.id}> Syncronization {"completed" if finished else "interrupted"}. Took {timeToComplete}'
+                )
+
+            logging.info(f'[Core] Message cache syncronization {"complete" if finished else "interrupted"}')
+
+    async def store_message_cache(self, channel, progress: typing.Optional[dict] = None):
+        '''
+        Record metadata for every message in a channel, oldest first. The last processed message ID is checkpointed
+        in bowser.cache_sync after each page so an interrupted run picks up where it stopped.
+        '''
         db = mclient.bowser.messages
+        checkpoints = mclient.bowser.cache_sync
+        checkpoint = await checkpoints.find_one({'_id': channel.id})
+        after = discord.Object(id=checkpoint['last_id']) if checkpoint else None
+
         x = 0
         y = 0
-        async for message in channel.history(limit=None):
-            x += 1
-            if message.author.bot:
+        batch = []
+        async for message in channel.history(limit=None, after=after, oldest_first=True):
+            batch.append(message)
+            if len(batch) < 100:  # Matches the history page size
                 continue
 
-            msg = db.find_one({'_id': message.id})
-            if not msg:
-                y += 1
-                db.insert_one(
-                    {
-                        '_id': message.id,
-                        'author': message.author.id,
-                        'guild': message.guild.id,
-                        'channel': message.channel.id,
-                        'timestamp': int(message.created_at.timestamp()),
-                    }
-                )
+            stored = await self._store_message_batch(db, checkpoints, channel, batch, progress)
+            x += len(batch)
+            y += stored
+            batch = []
+
+        if batch:
+            stored = await self._store_message_batch(db, checkpoints, channel, batch, progress)
+            x += len(batch)
+            y += stored
 
         return x, y
 
+    async def _store_message_batch(
+        self, db, checkpoints, channel, batch: typing.List[discord.Message], progress: typing.Optional[dict]
+    ):
+        existing = set(await db.distinct('_id', {'_id': {'$in': [m.id for m in batch]}}))
+        docs = [
+            {
+                '_id': message.id,
+                'author': message.author.id,
+                'guild': message.guild.id,
+                'channel': message.channel.id,
+                'timestamp': int(message.created_at.timestamp()),
+            }
+            for message in batch
+            # Messages still buffered are written and counted by the message writer
+            if not message.author.bot and message.id not in existing and message.id not in self.messageWriter.pending
+        ]
+        if docs:
+            try:
+                await db.insert_many(docs, ordered=False)
+
+            except pymongo.errors.BulkWriteError as e:
+                # New messages may be written by on_message at the same time, duplicates are expected
+                failed = {error['index'] for error in e.details['writeErrors']}
+                docs = [doc for index, doc in enumerate(docs) if index not in failed]
+
+            await tools.rollup_messages(docs)
+            await tools.record_user_activity(docs)
+
+        await checkpoints.update_one(
+            {'_id': channel.id}, {'$set': {'last_id': batch[-1].id, 'updated': int(time.time())}}, upsert=True
+        )
+        if progress is not None:
+            progress['processed'] += len(batch)
+            progress['recorded'] += len(docs)
+
+        return len(docs)
+
 
 async def setup(bot):
     await bot.add_cog(MainEvents(bot))
@@ -1,20 +1,33 @@
+import asyncio
+import collections
+import hashlib
 import io
+import json
 import logging
 from datetime import datetime, timezone
-from typing import Tuple
+from typing import Optional, Tuple
 
 import aiohttp
 import config  # type: ignore
 import discord
+import numpy as np
 import pymongo
 import rapidfuzz
 from dateutil import parser
 from discord import app_commands
 from discord.ext import commands, tasks
 
-mclient = pymongo.MongoClient(config.mongoURI)
+import cache  # type: ignore
+import database  # type: ignore
+import tools  # type: ignore
+
+mclient = database.client()
 
 AUTO_SYNC = True
+HTTP_LIMIT_PER_HOST = 4
+SYNC_PAGE_CONCURRENCY = 4
+SYNC_WRITE_BATCH = 1000
+SEARCH_CANDIDATES = 2000
 SEARCH_RATIO_THRESHOLD = 50
 DEKU_UTM = "utm_campaign=rnintendoswitch&utm_medium=social&utm_source=discord"
 
@@ -22,29 +35,148 @@ DEKU_UTM = "utm_campaign=rnintendoswitch&utm_medium=social&utm_source=discord"
 class DekuDeals:
     def __init__(self, api_key):
         self.ENDPOINT = 'https://www.dekudeals.com/api/rNS/games'
+        self.PAGE_SIZE = 100
         self.api_key = api_key
 
-    async def fetch_games(self, platform: str):
-        offset = 0
+    async def _fetch_page(self, session: aiohttp.ClientSession, platform: str, offset: int) -> list:
+        params = {'api_key': self.api_key, 'offset': offset}
+
+        if platform:
+            params['platform'] = platform
 
-        for _ in range(1, 1500):
-            async with aiohttp.ClientSession() as session:
-                headers = {'User-Agent': 'MechaBowser (+https://github.com/rNintendoSwitch/MechaBowser)'}
-                params = {'api_key': self.api_key, 'offset': offset}
+        async with session.get(self.ENDPOINT, params=params) as resp:
+            resp.raise_for_status()
+            return (await resp.json())['games']
 
-                if platform:
-                    params['platform'] = platform
+    async def fetch_games(self, session: aiohttp.ClientSession, platform: str):
+        '''Yields every game for a platform. Up to SYNC_PAGE_CONCURRENCY pages are requested ahead of the consumer'''
+        pages = collections.deque()
+        offset = 0
+        try:
+            for _ in range(1, 1500):
+                while len(pages) < SYNC_PAGE_CONCURRENCY:
+                    pages.append(asyncio.create_task(self._fetch_page(session, platform, offset)))
+                    offset += self.PAGE_SIZE
+
+                games = await pages.popleft()
+                for item in games:
+                    yield item
+
+                if len(games) < self.PAGE_SIZE:
+                    break  # no more results expected
+
+        finally:
+            for page in pages:  # Requested past the end, or the sync failed
+                page.cancel()
+
+
+class GameRecord:
+    '''The fields of a bowser.games document that commands and profile cards read, held for every game in memory'''
+
+    __slots__ = (
+        'deku_id',
+        'name',
+        'image',
+        'deku_link',
+        'platforms',
+        'release_date',
+        'eshop_price',
+        'developers',
+        'publishers',
+    )
+
+    PROJECTION = {**{field: 1 for field in __slots__ if field != 'platforms'}, '_last_synced': 1, '_id': 0}
+
+    def __init__(self, document: dict):
+        self.deku_id = document['deku_id']
+        self.name = document.get('name')
+        self.image = document.get('image')
+        self.deku_link = document.get('deku_link')
+        self.platforms = tuple(document.get('_last_synced') or ())  # Releases the game is currently listed for
+        self.release_date = document.get('release_date') or {}
+        self.eshop_price = document.get('eshop_price') or {}
+        self.developers = tuple(document.get('developers') or ())
+        self.publishers = tuple(document.get('publishers') or ())
+
+
+class GameSearchIndex:
+    '''
+    Fuzzy title search over the games catalog, built once per sync. Titles are pre-processed for rapidfuzz and indexed
+    by trigram, so a query only fully scores the SEARCH_CANDIDATES titles sharing the most trigrams with it. Results
+    are memoized per query, which covers the repeated keystrokes of autocomplete
+    '''
+
+    def __init__(self, games: list):
+        self.games = [g for g in games if g.get('name')]
+        self.names = [g['name'] for g in self.games]
+        self.processed = [rapidfuzz.utils.default_process(name) for name in self.names]
+
+        # If our query isn't short (>5 chars), then filter out short game titles.
+        # This prevents things like 'a' being the best match for 'realMyst' and not 'realMyst: Masterpiece Edition'
+        self.long = np.array([len(name) > 5 for name in self.names], dtype=bool)
+
+        postings = collections.defaultdict(list)
+        gramCounts = []
+        for i, name in enumerate(self.processed):
+            grams = self._grams(name)
+            gramCounts.append(len(grams))
+            for gram in grams:
+                postings[gram].append(i)
+
+        self.gramCounts = np.array(gramCounts, dtype=np.float32)
+
+        self.postings = {gram: np.array(indexes, dtype=np.int32) for gram, indexes in postings.items()}
+        self.results = cache.LRUCache(max_items=4096)
+
+    @staticmethod
+    def _grams(text: str) -> set:
+        text = f' {text} '  # Pad so word starts and ends are grams too
+        return {text[i : i + 3] for i in range(len(text) - 2)}
+
+    def _candidates(self, query: str, long_only: bool) -> np.ndarray:
+        '''Indexes of titles worth scoring for a processed query, in catalog order'''
+        allowed = self.long if long_only else np.ones(len(self.names), dtype=bool)
+        queryGrams = self._grams(query)
+        postings = [self.postings[gram] for gram in queryGrams if gram in self.postings]
+        if not postings or np.count_nonzero(allowed) <= SEARCH_CANDIDATES:
+            return np.flatnonzero(allowed)
+
+        counts = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        counts[~allowed] = 0
+        if np.count_nonzero(counts) <= SEARCH_CANDIDATES:
+            return np.flatnonzero(counts)
+
+        # Share of the shorter string's grams that match, like WRatio's partial scoring short titles aren't penalised
+        # Titles that process to an empty string have no grams, and no matching grams either
+        coverage = counts / np.maximum(np.minimum(self.gramCounts, len(queryGrams)), 1)
+        return np.sort(np.argpartition(coverage, -SEARCH_CANDIDATES)[-SEARCH_CANDIDATES:])
 
-                async with session.get(self.ENDPOINT, params=params, headers=headers) as resp:
-                    resp_json = await resp.json()
+    def search(self, query: str, multiResult=False):
+        key = (query, multiResult)
+        if key in self.results:
+            return self.results.get(key)
 
-                    for item in resp_json['games']:
-                        yield item
+        processedQuery = rapidfuzz.utils.default_process(query)
+        candidates = self._candidates(processedQuery, len(query) > 5)
+        results = rapidfuzz.process.extract(
+            processedQuery,
+            [self.processed[i] for i in candidates],
+            scorer=rapidfuzz.fuzz.WRatio,
+            limit=10 if multiResult else 1,
+            processor=None,  # Titles were processed when indexed
+            score_cutoff=SEARCH_RATIO_THRESHOLD,
+        )
 
-                    offset += len(resp_json['games'])
+        ret = None
+        if results:
+            ret = [
+                {'deku_id': self.games[candidates[i]]['deku_id'], 'score': score, 'name': self.names[candidates[i]]}
+                for _, score, i in results
+            ]
+            ret = ret if multiResult else ret[0]
 
-                    if len(resp_json['games']) < 100:
-                        break  # no more results expected
+        self.results.put(key, ret)
+        return ret
 
 
 class Games(commands.Cog, name='Games'):
@@ -55,12 +187,19 @@ class Games(commands.Cog, name='Games'):
 
         self.last_sync = {'at': None, 'running': False}
 
-        # Ensure indices exist
-        self.db.create_index([("deku_id", pymongo.ASCENDING)], unique=True)
-
         self.gameNamesCache = None
+        self.gameRecords = {}  # deku_id: GameRecord
+        self.searchIndex = None
         self.topGames = None
-        self.recalculate_cache()
+        self.favouriteCounts = collections.Counter()  # deku_id: users with the game in their favorites
+        self.session = None
+
+    async def cog_load(self):
+        # Ensure indices exist
+        await self.db.create_index([("deku_id", pymongo.ASCENDING)], unique=True)
+
+        await self.count_favourites()
+        await self.recalculate_cache()
 
         if AUTO_SYNC:
             self.sync_db.start()
@@ -69,8 +208,27 @@ class Games(commands.Cog, name='Games'):
         if AUTO_SYNC:
             self.sync_db.cancel()
 
+        if self.session:
+            await self.session.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        '''Shared session for image downloads, so connections are pooled and concurrency per host is bounded'''
+        if not self.session or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=HTTP_LIMIT_PER_HOST),
+                headers={'User-Agent': 'MechaBowser (+https://github.com/rNintendoSwitch/MechaBowser)'},
+                timeout=aiohttp.ClientTimeout(total=30),
+            )
+
+        return self.session
+
     @tasks.loop(hours=1)
     async def sync_db(self) -> Tuple[int, str]:
+        '''
+        Upsert the DekuDeals catalog. Each game's payload is hashed per platform and stored in `_hash`, so only games
+        that changed since the last sync are written, in unordered batches. Games no longer listed on a platform lose
+        that platform's fields, and games listed on neither are deleted
+        '''
         logging.info(f'[Games] Syncing games database...')
         self.last_sync['running'] = True
 
@@ -80,10 +238,26 @@ class Games(commands.Cog, name='Games'):
         # Generate a timestamp to use for marking last sync time
         sync_time = datetime.now(tz=timezone.utc)
 
+        existing = {}  # deku_id: {platform: hash}
+        async for game in self.db.find({}, projection={'deku_id': 1, '_hash': 1}):
+            existing[game['deku_id']] = game.get('_hash', {})
+
         count = 0
+        changed = 0
+        seen = set()
         for platform in ['switch', 'switch_2']:
+            operations = []
+            listed = set()
             try:
-                async for game in self.DekuDeals.fetch_games(platform):
+                async for game in self.DekuDeals.fetch_games(self._get_session(), platform):
+                    listed.add(game['deku_id'])
+                    count += 1
+
+                    # Stored with the document, an identical payload on the next sync is skipped
+                    digest = hashlib.sha1(json.dumps(game, sort_keys=True, default=str).encode()).hexdigest()
+                    if existing.get(game['deku_id'], {}).get(platform) == digest:
+                        continue
+
                     game['_last_synced'] = sync_time
 
                     if game['release_date']:
@@ -96,99 +270,132 @@ class Games(commands.Cog, name='Games'):
                     for field in release_fields:
                         filtered_update_dict[f"{field}.{platform}"] = game[field] if field in game else None
 
-                    self.db.update_one({'deku_id': game['deku_id']}, {'$set': filtered_update_dict}, upsert=True)
-                    count += 1
+                    filtered_update_dict[f'_hash.{platform}'] = digest
+                    operations.append(
+                        pymongo.UpdateOne({'deku_id': game['deku_id']}, {'$set': filtered_update_dict}, upsert=True)
+                    )
+                    if len(operations) >= SYNC_WRITE_BATCH:
+                        changed += await self._write_sync_batch(operations)
+                        operations = []
+
+                changed += await self._write_sync_batch(operations)
 
             except Exception as e:
                 logging.error(f'[Games] Exception while syncing games: {e}')
+                self.last_sync['running'] = False
                 raise
 
-            # Remove data from release fields for any that didn't get updated for this release
-            unset_dict = dict()
-            for field in release_fields:
-                if field not in unset_dict:
-                    unset_dict[field] = dict()
+            # Remove data from release fields for any that are no longer listed for this release
+            delisted = [deku_id for deku_id, hashes in existing.items() if platform in hashes and deku_id not in listed]
+            if delisted:
+                unset_dict = {f'{field}.{platform}': '' for field in release_fields + ['_hash']}
+                await self.db.update_many({'deku_id': {'$in': delisted}}, {'$unset': unset_dict})
 
-                unset_dict[field][platform] = ''
+            seen |= listed
 
-            self.db.update_many({'_last_synced': {platform: {'$lt': sync_time}}}, {'$unset': unset_dict})
+        # If games are not listed for any release, delete them
+        removed = [deku_id for deku_id in existing if deku_id not in seen]
+        if removed:
+            await self.db.delete_many({'deku_id': {'$in': removed}})
 
-        # If items were not updated, delete them
-        self.db.delete_many(
-            {"$or": [{"_last_synced.switch": {'$lt': sync_time}}, {"_last_synced.switch_2": {'$lt': sync_time}}]}
+        await mclient.bowser.sync_status.replace_one(
+            {'_id': 'games'},
+            {'at': sync_time, 'games': count, 'changed': changed, 'removed': len(removed)},
+            upsert=True,
         )
-
-        logging.info(f'[Games] Finished syncing {count} games')
+        logging.info(f'[Games] Finished syncing {count} games, {changed} changed and {len(removed)} removed')
 
         self.last_sync = {'at': sync_time, 'running': False}
-        self.recalculate_cache()
+        await self.recalculate_cache()
         return count
 
-    def recalculate_cache(self):
-        self.gameNamesCache = list(self.db.aggregate([{'$project': {'deku_id': 1, 'name': 1}}]))
+    async def _write_sync_batch(self, operations: list) -> int:
+        if not operations:
+            return 0
+
+        await self.db.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    async def recalculate_cache(self):
+        records = {}
+        async for document in self.db.find({}, projection=GameRecord.PROJECTION):
+            records[document['deku_id']] = GameRecord(document)
+
+        self.gameRecords = records
+        self.gameNamesCache = [{'deku_id': game.deku_id, 'name': game.name} for game in records.values()]
+        self.searchIndex = await asyncio.get_running_loop().run_in_executor(None, GameSearchIndex, self.gameNamesCache)
+        tools.autocompleter.invalidate('games')  # Every search result depends on the records
+
+        self._update_top_games()
+
+    async def count_favourites(self):
+        '''Tally every user's favorite games once, update_favourites keeps the tally current afterwards'''
+        counts = await mclient.bowser.users.aggregate(
+            [
+                {'$match': {'favgames.0': {'$exists': True}}},
+                {'$unwind': '$favgames'},
+                {'$group': {'_id': '$favgames', 'count': {'$sum': 1}}},
+            ]
+        )
+        self.favouriteCounts = collections.Counter({count['_id']: count['count'] for count in counts})
+
+    def update_favourites(self, old: Optional[list], new: Optional[list]):
+        '''Apply a change to a user's favorite games, given the lists before and after the change'''
+        if (old or []) == (new or []):
+            return
 
-        # Cache the 10 most popular games
-        users = mclient.bowser.users.find({"favgames": {'$exists': True, '$not': {'$size': 0}}})
-        games = {}
-        for user in users:
-            for game_id in user['favgames']:
-                if game_id not in games:
-                    games[game_id] = 1
+        self.favouriteCounts.subtract(old or [])
+        self.favouriteCounts.update(new or [])
+        for deku_id in old or []:
+            if self.favouriteCounts[deku_id] <= 0:
+                del self.favouriteCounts[deku_id]
 
-                else:
-                    games[game_id] += 1
+        self._update_top_games()
 
-        top_10 = dict(sorted(games.items(), key=lambda kv: kv[1], reverse=True)[0:10])
-        games = self.db.find({"deku_id": {"$in": list(top_10.keys())}}, projection={'deku_id': 1, 'name': 1})
+    def _update_top_games(self):
+        # Cache the 10 most popular games
+        self.topGames = [
+            {'deku_id': deku_id, 'name': self.gameRecords[deku_id].name}
+            for deku_id, _ in self.favouriteCounts.most_common(10)
+            if deku_id in self.gameRecords
+        ]
+        tools.autocompleter.invalidate('games', '')  # Only the empty query suggests the top games
 
-        self.topGames = list(games)
+    def get_game(self, deku_id: str) -> Optional[GameRecord]:
+        return self.gameRecords.get(deku_id)
 
     async def get_image(self, deku_id: str, as_url: bool = False):
-        game = self.db.find_one({'deku_id': deku_id}, projection={'image': 1})
+        game = self.get_game(deku_id)
 
-        if not game or 'image' not in game:
+        if not game or not game.image:
             return None
 
-        url = game['image']
+        url = game.image
 
         if as_url:
             return url
 
-        async with aiohttp.ClientSession() as session:
-            headers = {'User-Agent': 'MechaBowser (+https://github.com/rNintendoSwitch/MechaBowser)'}
-            async with session.get(url, headers=headers) as resp:
-                resp.raise_for_status()
-                data = await resp.read()
-                return io.BytesIO(data)
-
-    def get_name(self, deku_id: str):
-        document = self.db.find_one({'deku_id': deku_id}, projection={'name': 1})
-        return document['name'] if document else None
-
-    def search(self, query: str, multiResult=False):
-        gameList = self.gameNamesCache
+        return io.BytesIO(await self.fetch_image(url))
 
-        # If our query isn't short (>5 chars), then filter out short game titles.
-        # This prevents things like 'a' being the best match for 'realMyst' and not 'realMyst: Masterpiece Edition'
-        if len(query) > 5:
-            gameList = [g for g in gameList if len(g['name']) > 5]
+    async def fetch_image(self, url: str) -> bytes:
+        async with self._get_session().get(url) as resp:
+            resp.raise_for_status()
+            return await resp.read()
 
-        results = rapidfuzz.process.extract(
-            query,
-            [g['name'] for g in gameList],
-            scorer=rapidfuzz.fuzz.WRatio,
-            limit=10 if multiResult else 1,
-            processor=rapidfuzz.utils.default_process,
-            score_cutoff=SEARCH_RATIO_THRESHOLD,
-        )
+    async def get_name(self, deku_id: str):
+        game = self.get_game(deku_id)
+        return game.name if game else None
 
-        if not results:
+    def search(self, query: str, multiResult=False):
+        if not self.searchIndex:
             return None
 
-        ret = [{'deku_id': gameList[i]['deku_id'], 'score': score, 'name': name} for name, score, i in results]
-        return ret if multiResult else ret[0]
+        return self.searchIndex.search(query, multiResult)
 
     async def _games_search_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await tools.autocompleter.run(interaction, 'games', current, self._games_search_choices)
+
+    async def _games_search_choices(self, current: str):
         if current:
             games = self.search(current, True)
 
@@ -215,44 +422,39 @@ class Games(commands.Cog, name='Games'):
         '''Search for Nintendo Switch games'''
         await interaction.response.defer()
 
-        user_deku_id = self.db.find_one({'deku_id': query.strip()})
-        game = None
+        game = self.get_game(query.strip())  # User clicked an autocomplete, giving us the exact deku_id
 
-        if user_deku_id:
-            game = user_deku_id  # User clicked an autocomplete, giving us the exact deku_id
-            result = {'deku_id': user_deku_id['deku_id'], 'score': 100.0, 'name': user_deku_id['name']}
-
-        else:
+        if not game:
             result = self.search(query)
 
             if result and result['deku_id']:
-                game = self.db.find_one({'deku_id': result['deku_id']})
+                game = self.get_game(result['deku_id'])
 
         if game:
             embed = discord.Embed(
-                title=game['name'],
-                url=f"{game['deku_link']}?{DEKU_UTM}&utm_content=mechabowser-game-search",
-                timestamp=self.get_db_last_update(),
+                title=game.name,
+                url=f"{game.deku_link}?{DEKU_UTM}&utm_content=mechabowser-game-search",
+                timestamp=await self.get_db_last_update(),
             )
             embed.set_footer(
                 text=f'Data provided by DekuDeals',
                 icon_url='https://www.dekudeals.com/favicon-32x32.png',
             )
 
-            if game['image']:
-                embed.set_thumbnail(url=game['image'])
+            if game.image:
+                embed.set_thumbnail(url=game.image)
 
             # Release Dates
             dates = {}
 
-            if game["release_date"] and "switch" in game["release_date"] and game["release_date"]["switch"]:
-                dates["Switch"] = game["release_date"]["switch"].date()
-            elif 'switch' in game['_last_synced']:
+            if game.release_date.get("switch"):
+                dates["Switch"] = game.release_date["switch"].date()
+            elif 'switch' in game.platforms:
                 dates["Switch"] = "*Unknown*"
 
-            if game["release_date"] and "switch_2" in game["release_date"] and game["release_date"]["switch_2"]:
-                dates["Switch 2"] = game["release_date"]["switch_2"].date()
-            elif 'switch_2' in game['_last_synced']:
+            if game.release_date.get("switch_2"):
+                dates["Switch 2"] = game.release_date["switch_2"].date()
+            elif 'switch_2' in game.platforms:
                 dates["Switch 2"] = "*Unknown*"
 
             lines = []
@@ -263,16 +465,16 @@ class Games(commands.Cog, name='Games'):
             embed.add_field(name=f'Release Date{s}', value="\n".join(lines), inline=False)
 
             # eShop Prices
-            if game["eshop_price"]:
+            if game.eshop_price:
                 prices = {}
 
-                if "switch" in game["eshop_price"] and game["eshop_price"]["switch"]:
-                    if "us" in game["eshop_price"]["switch"] and game["eshop_price"]["switch"]["us"]:
-                        prices["Switch"] = game["eshop_price"]["switch"]["us"]
+                if "switch" in game.eshop_price and game.eshop_price["switch"]:
+                    if "us" in game.eshop_price["switch"] and game.eshop_price["switch"]["us"]:
+                        prices["Switch"] = game.eshop_price["switch"]["us"]
 
-                if "switch_2" in game["eshop_price"] and game["eshop_price"]["switch_2"]:
-                    if "us" in game["eshop_price"]["switch_2"] and game["eshop_price"]["switch_2"]["us"]:
-                        prices["Switch 2"] = game["eshop_price"]["switch_2"]["us"]
+                if "switch_2" in game.eshop_price and game.eshop_price["switch_2"]:
+                    if "us" in game.eshop_price["switch_2"] and game.eshop_price["switch_2"]["us"]:
+                        prices["Switch 2"] = game.eshop_price["switch_2"]["us"]
 
                 lines = []
                 for platform, price in prices.items():
@@ -297,26 +499,30 @@ class Games(commands.Cog, name='Games'):
                     embed.add_field(name=f'US eShop Price{s}', value="\n".join(lines), inline=False)
 
             # Devs and Pubs
-            if game['developers']:
-                s = "" if len(game['developers']) == 1 else "s"
-                embed.add_field(name=f'Developer{s}', value=", ".join(game['developers']), inline=True)
+            if game.developers:
+                s = "" if len(game.developers) == 1 else "s"
+                embed.add_field(name=f'Developer{s}', value=", ".join(game.developers), inline=True)
 
-            if game['publishers']:
-                s = "" if len(game['publishers']) == 1 else "s"
-                embed.add_field(name=f'Publisher{s}', value=", ".join(game['publishers']), inline=True)
+            if game.publishers:
+                s = "" if len(game.publishers) == 1 else "s"
+                embed.add_field(name=f'Publisher{s}', value=", ".join(game.publishers), inline=True)
 
             return await interaction.followup.send(embed=embed)
 
         else:
             return await interaction.followup.send(f'{config.redTick} No results found.')
 
-    def get_db_last_update(self):
+    async def get_db_last_update(self):
         if self.last_sync['at']:
             return self.last_sync['at']
 
+        status = await mclient.bowser.sync_status.find_one({'_id': 'games'})
+        if status:
+            return status['at'].replace(tzinfo=timezone.utc)
+
         else:
-            newest_sw1_update_game = self.db.find_one(sort=[("_last_synced.switch", -1)])
-            newest_sw2_update_game = self.db.find_one(sort=[("_last_synced.switch_2", -1)])
+            newest_sw1_update_game = await self.db.find_one(sort=[("_last_synced.switch", -1)])
+            newest_sw2_update_game = await self.db.find_one(sort=[("_last_synced.switch_2", -1)])
 
             if newest_sw1_update_game['_last_synced']['switch'] > newest_sw2_update_game['_last_synced']['switch_2']:
                 return newest_sw1_update_game['_last_synced']['switch']
@@ -336,13 +542,13 @@ class Games(commands.Cog, name='Games'):
             ),
         )
 
-        game_count = self.db.count_documents({})
+        game_count = await self.db.count_documents({})
         embed.add_field(name='Games Stored', value=game_count, inline=True)
 
         if self.last_sync['running']:
             last_sync = f"*Fetch in-progress...*"
         else:
-            last_sync = f"<t:{int(self.get_db_last_update().timestamp())}:R>"
+            last_sync = f"<t:{int((await self.get_db_last_update()).timestamp())}:R>"
 
         embed.add_field(name=f'Last Fetch', value=last_sync, inline=True)
 
@@ -8,13 +8,13 @@ from itertools import batched
 
 import config
 import discord
-import pymongo
 from discord import app_commands
 from discord.ext import commands, tasks
 
+import database
 import tools
 
-mclient = pymongo.MongoClient(config.mongoURI)
+mclient = database.client()
 
 
 class Moderation(commands.Cog, name='Moderation Commands'):
@@ -37,7 +37,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
         # Publish all unposted/pending public modlogs on cog load
         db = mclient.bowser.puns
         pendingLogs = db.find({'public': True, 'public_log_message': None, 'type': {'$ne': 'note'}})
-        for log in pendingLogs:
+        async for log in pendingLogs:
             await tools.send_public_modlog(self.bot, log['_id'], self.publicModLogs)
 
         # Run expiration tasks
@@ -46,12 +46,12 @@ class Moderation(commands.Cog, name='Moderation Commands'):
         twelveHr = 60 * 60 * 12
         trackedStrikes = []  # List of unique users
         logging.info('[Moderation] Starting infraction expiration checks')
-        for pun in pendingPuns:
+        async for pun in pendingPuns:
             await asyncio.sleep(0.5)
             if pun['type'] == 'strike':
                 if pun['user'] in trackedStrikes:
                     continue  # We don't want to create many tasks when we only remove one
-                user = userDB.find_one({'_id': pun['user']})
+                user = await userDB.find_one({'_id': pun['user']})
                 trackedStrikes.append(pun['user'])
                 tryTime = 0  # Default to immediately
                 try:
@@ -63,7 +63,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
                         )
 
                 except KeyError:  # Edge case for missing strike_check field
-                    userDB.update_one({'_id': pun['user']}, {'$set': {'strike_check': time.time()}})
+                    await userDB.update_one({'_id': pun['user']}, {'$set': {'strike_check': time.time()}})
 
                 finally:
                     self.schedule_task(tryTime, pun['_id'], config.nintendoswitch)
@@ -87,7 +87,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
     @commands.max_concurrency(1, commands.BucketType.guild, wait=True)
     async def _hide_modlog(self, interaction: discord.Interaction, uuid: str):
         db = mclient.bowser.puns
-        doc = db.find_one({'_id': uuid})
+        doc = await db.find_one({'_id': uuid})
 
         await interaction.response.defer(ephemeral=tools.mod_cmd_invoke_delete(interaction.channel))
         if not doc:
@@ -97,7 +97,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
 
         if not doc['public_log_message']:
             # Public log has not been posted yet
-            db.update_one({'_id': uuid}, {'$set': {'sensitive': sensitive}})
+            await db.update_one({'_id': uuid}, {'$set': {'sensitive': sensitive}})
             return await interaction.followup.send(
                 f'{config.greenTick} Successfully {"" if sensitive else "un"}marked modlog as sensitive',
             )
@@ -140,7 +140,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
             assert (
                 embedDict['fields'] != newEmbedDict['fields']
             )  # Will fail if message was unchanged, this is likely because of a breaking change upstream in the pun flow
-            db.update_one({'_id': uuid}, {'$set': {'sensitive': sensitive}})
+            await db.update_one({'_id': uuid}, {'$set': {'sensitive': sensitive}})
             newEmbed = discord.Embed.from_dict(newEmbedDict)
             await message.edit(embed=newEmbed)
 
@@ -177,7 +177,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
         duration: str = None,
     ):
         db = mclient.bowser.puns
-        doc = db.find_one({'_id': uuid})
+        doc = await db.find_one({'_id': uuid})
         if not doc:
             return await interaction.followup.send(f'{config.redTick} An invalid infraction id was provided')
 
@@ -225,7 +225,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
             if member:
                 await member.edit(timed_out_until=_duration, reason='Mute duration modified by moderator')
 
-            db.update_one({'_id': uuid}, {'$set': {'expiry': int(stamp)}})
+            await db.update_one({'_id': uuid}, {'$set': {'expiry': int(stamp)}})
             await tools.send_modlog(
                 self.bot,
                 self.modLogs,
@@ -239,7 +239,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
             )
 
         else:
-            db.update_one({'_id': uuid}, {'$set': {'reason': reason}})
+            await db.update_one({'_id': uuid}, {'$set': {'reason': reason}})
             await tools.send_modlog(
                 self.bot,
                 self.modLogs,
@@ -318,7 +318,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
             return await interaction.followup.send(f'{config.redTick} You do not have permission to run this command')
 
         db = mclient.bowser.puns
-        doc = db.find_one_and_delete({'_id': uuid})
+        doc = await db.find_one_and_delete({'_id': uuid})
         if not doc:  # Delete did nothing if doc is None
             return await interaction.followup.send(f'{config.redTick} No matching infraction found')
 
@@ -538,13 +538,13 @@ class Moderation(commands.Cog, name='Moderation Commands'):
         except discord.NotFound:
             return await interaction.followup.send(f'{config.redTick} {user} is not currently banned')
 
-        openAppeal = mclient.modmail.logs.find_one({'open': True, 'ban_appeal': True, 'recipient.id': user.id})
+        openAppeal = await mclient.modmail.logs.find_one({'open': True, 'ban_appeal': True, 'recipient.id': user.id})
         if openAppeal:
             return await interaction.followup.send(
                 f'{config.redTick} You cannot use the unban command on {user} while a ban appeal is in-progress. You can accept the appeal in <#{int(openAppeal["channel_id"])}> with `/appeal accept [reason]`',
             )
 
-        db.find_one_and_update({'user': user.id, 'type': 'ban', 'active': True}, {'$set': {'active': False}})
+        await db.find_one_and_update({'user': user.id, 'type': 'ban', 'active': True}, {'$set': {'active': False}})
         docID = await tools.issue_pun(user.id, interaction.user.id, 'unban', reason, active=False)
         await interaction.guild.unban(user, reason='Unban action performed by moderator')
         await tools.send_modlog(
@@ -677,7 +677,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
         await interaction.response.defer(ephemeral=tools.mod_cmd_invoke_delete(interaction.channel))
 
         db = mclient.bowser.puns
-        if db.find_one({'user': member.id, 'type': 'mute', 'active': True}):
+        if await db.find_one({'user': member.id, 'type': 'mute', 'active': True}):
             return await interaction.followup.send(f'{config.redTick} {member} ({member.id}) is already muted')
 
         try:
@@ -758,7 +758,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
         await interaction.response.defer(ephemeral=tools.mod_cmd_invoke_delete(interaction.channel))
 
         db = mclient.bowser.puns
-        action = db.find_one_and_update(
+        action = await db.find_one_and_update(
             {'user': member.id, 'type': 'mute', 'active': True}, {'$set': {'active': False}}
         )
         if not action:
@@ -854,14 +854,14 @@ class Moderation(commands.Cog, name='Moderation Commands'):
 
         punDB = mclient.bowser.puns
         userDB = mclient.bowser.users
-        userDoc = userDB.find_one({'_id': user.id})
+        userDoc = await userDB.find_one({'_id': user.id})
         if not userDoc:
             return await interaction.followup.send(
                 f'{config.redTick} Unable strike user who has never joined the server'
             )
 
         activeStrikes = 0
-        for pun in punDB.find({'user': user.id, 'type': 'strike', 'active': True}):
+        async for pun in punDB.find({'user': user.id, 'type': 'strike', 'active': True}):
             activeStrikes += pun['active_strike_count']
 
         error = ""
@@ -885,9 +885,9 @@ class Moderation(commands.Cog, name='Moderation Commands'):
                 diff = removedStrikes  # accumlator
 
                 puns = punDB.find({'user': user.id, 'type': 'strike', 'active': True}).sort('timestamp', 1)
-                for pun in puns:
+                async for pun in puns:
                     if pun['active_strike_count'] - diff >= 0:
-                        punDB.update_one(
+                        await punDB.update_one(
                             {'_id': pun['_id']},
                             {
                                 '$set': {
@@ -896,7 +896,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
                                 }
                             },
                         )
-                        userDB.update_one(
+                        await userDB.update_one(
                             {'_id': user.id}, {'$set': {'strike_check': time.time() + (60 * 60 * 24 * 7)}}
                         )
                         self.schedule_task(60 * 60 * 12, pun['_id'], interaction.guild.id)
@@ -911,7 +911,9 @@ class Moderation(commands.Cog, name='Moderation Commands'):
                         break
 
                     elif pun['active_strike_count'] - diff < 0:
-                        punDB.update_one({'_id': pun['_id']}, {'$set': {'active_strike_count': 0, 'active': False}})
+                        await punDB.update_one(
+                            {'_id': pun['_id']}, {'$set': {'active_strike_count': 0, 'active': False}}
+                        )
                         diff -= pun['active_strike_count']
 
                 if diff != 0:  # Something has gone horribly wrong
@@ -990,7 +992,8 @@ class Moderation(commands.Cog, name='Moderation Commands'):
                 public=True,
             )
 
-            userDB.update_one({'_id': user.id}, {'$set': {'strike_check': time.time() + (60 * 60 * 24 * 7)}})  # 7 days
+            strikeCheck = time.time() + (60 * 60 * 24 * 7)  # 7 days
+            await userDB.update_one({'_id': user.id}, {'$set': {'strike_check': strikeCheck}})
             self.schedule_task(60 * 60 * 12, docID, interaction.guild.id)
 
             await interaction.followup.send(
@@ -1036,7 +1039,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
     async def expire_actions(self, _id, guild):
         await asyncio.sleep(0.5)
         db = mclient.bowser.puns
-        doc = db.find_one({'_id': _id})
+        doc = await db.find_one({'_id': _id})
         if not doc:
             logging.error(f'[Moderation] Expiry failed. Doc {_id} does not exist!')
             return
@@ -1049,7 +1052,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
         twelveHr = 60 * 60 * 12
         if doc['type'] == 'strike':
             userDB = mclient.bowser.users
-            user = userDB.find_one({'_id': doc['user']})
+            user = await userDB.find_one({'_id': doc['user']})
             try:
                 if user['strike_check'] > time.time():
                     # To prevent drift we recall every 12 hours. Schedule for 12hr or expiry time, whichever is sooner
@@ -1070,10 +1073,11 @@ class Moderation(commands.Cog, name='Moderation Commands'):
 
             # Start logic
             if doc['active_strike_count'] - 1 == 0:
-                db.update_one({'_id': doc['_id']}, {'$set': {'active': False}, '$inc': {'active_strike_count': -1}})
-                strikes = [
-                    x for x in db.find({'user': doc['user'], 'type': 'strike', 'active': True}).sort('timestamp', 1)
-                ]
+                await db.update_one(
+                    {'_id': doc['_id']}, {'$set': {'active': False}, '$inc': {'active_strike_count': -1}}
+                )
+                query = {'user': doc['user'], 'type': 'strike', 'active': True}
+                strikes = await db.find(query).sort('timestamp', 1).to_list()
                 if not strikes:  # Last active strike expired, no additional
                     del self.taskHandles[_id]
                     return
@@ -1081,7 +1085,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
                 self.schedule_task(60 * 60 * 12, strikes[0]['_id'], guild)
 
             elif doc['active_strike_count'] > 0:
-                db.update_one({'_id': doc['_id']}, {'$inc': {'active_strike_count': -1}})
+                await db.update_one({'_id': doc['_id']}, {'$inc': {'active_strike_count': -1}})
                 self.schedule_task(60 * 60 * 12, doc['_id'], guild)
 
             else:
@@ -1091,7 +1095,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
                 del self.taskHandles[_id]
                 return
 
-            userDB.update_one({'_id': doc['user']}, {'$set': {'strike_check': time.time() + 60 * 60 * 24 * 7}})
+            await userDB.update_one({'_id': doc['user']}, {'$set': {'strike_check': time.time() + 60 * 60 * 24 * 7}})
 
         elif doc['type'] == 'mute' and doc['expiry']:  # A mute that has an expiry
             # To prevent drift we recall every 12 hours. Schedule for 12hr or expiry time, whichever is sooner
@@ -1115,7 +1119,7 @@ class Moderation(commands.Cog, name='Moderation Commands'):
             else:
                 member = await self.bot.fetch_user(doc['user'])
 
-            newPun = db.find_one_and_update({'_id': doc['_id']}, {'$set': {'active': False}})
+            newPun = await db.find_one_and_update({'_id': doc['_id']}, {'$set': {'active': False}})
             docID = await tools.issue_pun(
                 doc['user'],
                 self.bot.user.id,
@@ -1,34 +1,127 @@
 import asyncio
-import glob
+import collections
+import hashlib
 import io
 import json
 import logging
 import math
+import multiprocessing
 import os
 import random
 import re
 import time
 import typing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
 from pathlib import Path
 
-import codepoints
 import config  # type: ignore
 import discord
 import emoji_data
 import numpy as np
-import pymongo
 import pytz
 import token_bucket
 import yaml
 from discord import app_commands
 from discord.ext import commands
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 from rapidfuzz import process
 
+import cache  # type: ignore
+import database  # type: ignore
+import profile_render  # type: ignore
 import tools  # type: ignore
 
-mclient = pymongo.MongoClient(config.mongoURI)
+mclient = database.client()
+
+
+class RenderScheduler:
+    '''
+    Admission control for profile renders. At most `concurrency` jobs run at once. Waiting jobs are taken in priority
+    order, and round robin between requesting users within a priority, so one user cannot starve the rest. A job
+    submitted while another with the same key is queued or running shares its result instead of rendering again.
+    '''
+
+    INTERACTIVE = 0
+    BULK = 1
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.running = 0
+        self.queues = {self.INTERACTIVE: collections.OrderedDict(), self.BULK: collections.OrderedDict()}
+        self.inflight = {}
+        self.tasks = set()
+        self.stats = {
+            'rendered': 0,
+            'coalesced': 0,
+            'failed': 0,
+            'last_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'last_render_ms': 0.0,
+            'max_render_ms': 0.0,
+        }
+
+    @property
+    def queued(self) -> int:
+        return sum(len(jobs) for queue in self.queues.values() for jobs in queue.values())
+
+    async def submit(self, key, user_id: int, priority: int, func: typing.Callable[[], typing.Awaitable]):
+        if key in self.inflight:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self.inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        self.queues[priority].setdefault(user_id, collections.deque()).append((key, func, time.perf_counter()))
+        self._dispatch()
+
+        return await asyncio.shield(future)  # A cancelled caller doesn't cancel the render for anyone coalesced
+
+    def _dispatch(self):
+        while self.running < self.concurrency:
+            queue = next((q for _, q in sorted(self.queues.items()) if q), None)
+            if queue is None:
+                return
+
+            user_id, jobs = next(iter(queue.items()))
+            job = jobs.popleft()
+            if jobs:
+                queue.move_to_end(user_id)
+
+            else:
+                del queue[user_id]
+
+            self.running += 1
+            task = asyncio.create_task(self._run(*job))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, key, func: typing.Callable[[], typing.Awaitable], queued: float):
+        future = self.inflight[key]
+        start = time.perf_counter()
+        self.stats['last_wait_ms'] = (start - queued) * 1000
+        self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], self.stats['last_wait_ms'])
+
+        try:
+            future.set_result(await func())
+            self.stats['rendered'] += 1
+
+        except asyncio.CancelledError:
+            future.cancel()  # Otherwise coalesced waiters would wait forever, i.e. after the pool is shut down
+            self.stats['failed'] += 1
+            raise
+
+        except Exception as e:
+            future.set_exception(e)
+            self.stats['failed'] += 1
+
+        finally:
+            del self.inflight[key]
+            self.running -= 1
+            self.stats['last_render_ms'] = (time.perf_counter() - start) * 1000
+            self.stats['max_render_ms'] = max(self.stats['max_render_ms'], self.stats['last_render_ms'])
+            self._dispatch()
 
 
 class SocialFeatures(commands.Cog, name='Social Commands'):
@@ -36,8 +129,6 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
         self.bot = bot
         self.inprogressEdits = {}
 
-        self.Games = self.bot.get_cog('Games')
-
         # !profile ratelimits
         self.bucket_storage = token_bucket.MemoryStorage()
         self.profile_bucket = token_bucket.Limiter(1 / 30, 2, self.bucket_storage)  # burst limit 2, renews at 1 / 30 s
@@ -49,7 +140,7 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
         self.bot.tree.add_command(self.profileContextMenu, guild=discord.Object(id=config.nintendoswitch))
 
         # Profile generation
-        self.twemojiPath = 'resources/twemoji/assets/72x72/'
+        self.twemojiPath = profile_render.TWEMOJI_PATH
         self.bot_contributors = [
             125233822760566784,  # MattBSG
             123879073972748290,  # Lyrus
@@ -57,44 +148,27 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
             115840403458097161,  # FlapSnapple
         ]
 
-        # Profile generation - precaching
-        self.profileFonts = self._load_fonts(
-            {
-                'meta': ('Regular', 36),
-                'user': ('Regular', 48),
-                'subtext': ('Light', 48),
-                'medium': ('Light', 36),
-                'small': ('Light', 30),
-            }
-        )
-
         emoji_data.load_emoji_data()
 
-        with open("resources/profiles/themes.yml", 'r') as stream:
-            self.themes = yaml.safe_load(stream)
-
-        with open("resources/profiles/borders.yml", 'r') as stream:
-            self.borders = yaml.safe_load(stream)
-
         with open("resources/profiles/backgrounds.yml", 'r') as stream:
             self.backgrounds = yaml.safe_load(stream)
 
-            for bg_name in self.backgrounds.keys():
-                self.backgrounds[bg_name]["image"] = self._render_background_image_from_slug(bg_name)
-
-        for theme in self.themes.keys():
-            self.themes[theme]['pfpBackground'] = Image.open(
-                f'resources/profiles/layout/{theme}/pfp-background.png'
-            ).convert('RGBA')
-            self.themes[theme]['missingImage'] = (
-                Image.open(f'resources/profiles/layout/{theme}/missing-game.png').convert("RGBA").resize((120, 120))
-            )
-            self.themes[theme]['profileStatic'] = self._init_profile_static(theme)  # Do this last
-
-        self.trophyImgCache = {}
-        self.borderImgCache = {}
-        self.flagImgCache = {}
-        self.gameImgCache = {}
+        # Cards are drawn in worker processes which load the profile assets themselves, see profile_render.py
+        self.renderWorkers = getattr(config, 'profileRenderWorkers', 2)
+        self.encoder = profile_render.encoder_settings(getattr(config, 'profileEncoder', {}))
+        self.renderPool = self._create_render_pool()
+        self.renderScheduler = RenderScheduler(getattr(config, 'profileRenderConcurrency', 4))
+        # 120x120 game icon PNGs keyed by deku_id and image URL hash, see _cache_game_img
+        self.gameIconCache = cache.LRUCache(max_items=1024, max_bytes=32 * 1024 * 1024)
+        self.gameIconDiskCache = cache.DiskCache('resources/cache/games', 256 * 1024 * 1024, suffix='.png')
+        self.gameIconRetry = {}  # Cache key: timestamp a failed download can be retried
+        self.avatarCache = cache.LRUCache(max_items=4096, max_bytes=64 * 1024 * 1024)  # Avatar hash: RGBA pixels
+
+        # Finished cards keyed by a hash of their inputs, see _card_cache_key
+        self.cardCache = cache.LRUCache(max_items=512, max_bytes=64 * 1024 * 1024)
+        self.cardDiskCache = cache.DiskCache('resources/cache/profiles', 512 * 1024 * 1024)
+        self.cardCacheKeys = collections.defaultdict(set)  # User ID: cache keys, for invalidation
+        self.previewCache = cache.LRUCache(max_items=256, max_bytes=32 * 1024 * 1024)  # Background list: PNG bytes
 
         # Friend Code Regexs (\u2014 = em-dash)
         self.friendCodeRegex = {
@@ -162,11 +236,20 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
             ('trivia-gold-3', '<:triviagold3:1194031677715005490>'),
         ]
 
+        self.commonTimezones = []
+
+    async def cog_load(self):
+        # Start the render workers now rather than on the first profile request
+        for _ in range(self.renderWorkers):
+            self.renderPool.submit(profile_render.ping)
+
+        self.bot.loop.create_task(self.prefetch_game_icons())
+
         # Compile the most common timezones at runtime for autocomplete use
         db = mclient.bowser.users
         usersWithTimezones = db.find({'timezone': {'$ne': None}})
         timezones = {}
-        for user in usersWithTimezones:
+        async for user in usersWithTimezones:
             if user['timezone'] not in timezones.keys():
                 timezones[user['timezone']] = 1
 
@@ -175,6 +258,9 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
 
         self.commonTimezones = [x[0] for x in sorted(timezones.items(), key=lambda tz: tz[1], reverse=True)]
 
+    async def cog_unload(self):
+        self.renderPool.shutdown(wait=False)
+
     @app_commands.guilds(discord.Object(id=config.nintendoswitch))
     class SocialCommand(app_commands.Group):
         pass
@@ -193,7 +279,7 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
 
     async def _profile_view(self, interaction: discord.Interaction, member: discord.Member):
         db = mclient.bowser.users
-        dbUser = db.find_one({'_id': member.id})
+        dbUser = await db.find_one({'_id': member.id})
 
         # If profile not setup and running on self: force ephemeral and provide NUX
         if not dbUser['profileSetup'] and member == interaction.user:
@@ -222,202 +308,145 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
                         return
 
             await interaction.response.defer()
-            card = await self._generate_profile_card_from_member(member)
+            card = await self._generate_profile_card_from_member(member, requester=interaction.user.id)
             await interaction.followup.send(file=card)
 
-    def _load_fonts(self, fonts_defs):
-        '''Load normal and CJK versions of given dict of fonts'''
-        font_paths = {
-            None: 'resources/notosans/NotoSans-{0}.ttf',
-            'jp': 'resources/notosans/NotoSansCJKjp-{0}.otf',
-        }
-        fonts = {}
-
-        for name, (weight, size) in fonts_defs.items():
-            fonts[name] = {}
-            for font, path in font_paths.items():
-                font_path = path.format(weight)
-
-                if not os.path.isfile(font_path):
-                    raise Exception('Font file not found: ' + font_path)
-
-                fonts[name][font] = ImageFont.truetype(font_path, size)
-
-        return fonts
-
-    # https://medium.com/the-artificial-impostor/4ac839ba313a
-    def _determine_cjk_font(self, text):
-        '''Determine correct CJK font, if needed'''
-        if re.search(r"[\u3040-\u30ff\u4e00-\u9FFF]", text):
-            return 'jp'
-        return None
-
-    def _draw_text(self, draw: ImageDraw, xy, text: str, fill, fonts: dict):
-        font = fonts[self._determine_cjk_font(text)]
-        return draw.text(xy, text, tuple(fill), font)
-
-    def _init_profile_static(self, theme_name: str) -> Image:
-        '''Inits static elements above background for profile card precache'''
-        theme = self.themes[theme_name]
-
-        fonts = self.profileFonts
-        img = Image.new('RGBA', theme['pfpBackground'].size, (0, 0, 0, 0))
-
-        snoo = Image.open('resources/profiles/layout/snoo.png').convert("RGBA")
-        gameUnderline = Image.open(f'resources/profiles/layout/{theme_name}/trophy-case-underline.png').convert("RGBA")
-        trophyUnderline = Image.open(f'resources/profiles/layout/{theme_name}/favorite-games-underline.png').convert(
-            "RGBA"
+    def _create_render_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.renderWorkers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=profile_render.init_worker,
+            initargs=(self.encoder,),
         )
 
-        img.paste(snoo, (50, 50), snoo)
-        img.paste(trophyUnderline, (60, 610), trophyUnderline)
-        img.paste(gameUnderline, (1150, 95), gameUnderline)
-
-        draw = ImageDraw.Draw(img)
-        self._draw_text(draw, (150, 51), '/r/NintendoSwitch Discord', theme['branding'], fonts['meta'])
-        self._draw_text(draw, (150, 91), 'User Profile', theme['secondary_heading'], fonts['meta'])
-        self._draw_text(draw, (60, 460), 'Member since', theme['secondary_heading'], fonts['small'])
-        self._draw_text(draw, (435, 460), 'Messages sent', theme['secondary_heading'], fonts['small'])
-        self._draw_text(draw, (790, 460), 'Local time', theme['secondary_heading'], fonts['small'])
-        self._draw_text(draw, (1150, 42), 'Favorite games', theme['primary_heading'], fonts['medium'])
-        self._draw_text(draw, (60, 557), 'Trophy case', theme['primary_heading'], fonts['medium'])
-
-        return img
-
-    def _render_background_image_from_slug(self, name: str) -> Image:
-        bg = self.backgrounds[name]
-        img = Image.open(f'resources/profiles/backgrounds/{name}.png').convert("RGBA")
-        return self._render_background_image(img, bg['theme'], bg['trophy-bg-opacity'])
-
-    def _render_background_image(self, img, theme, trophy_bg_opacity):
-        tbg_opacity = str(trophy_bg_opacity)
-
-        ## Check theme ##
-        valid_themes = next(os.walk('resources/profiles/layout/'))[1]
-
-        if theme not in valid_themes:
-            raise ValueError(f'Invalid theme {theme}, must be one of: {", ".join(valid_themes)}')
+    def _attachment_name(self, kind: str) -> str:
+        '''File name for an encoded image, with the extension of its configured format'''
+        name = 'profile' if kind == 'card' else kind
+        return f'{name}.{profile_render.FORMAT_EXTENSIONS[self.encoder[kind]["format"]]}'
 
-        ## Check opacity ##
-        tcp = f'resources/profiles/layout/{theme}/trophy-bg/'
-        valid_opac = [os.path.splitext(u)[0] for u in [t.split('/')[-1] for t in glob.glob(os.path.join(tcp, '*.png'))]]
-
-        if tbg_opacity not in valid_opac:
-            v = ", ".join(valid_opac)
-            raise ValueError(f'Invalid trophy background opacity {tbg_opacity} for theme {theme}, must be one of: {v}')
-
-        ## Render ##
-        trophy_bg_path = f'resources/profiles/layout/{theme}/trophy-bg/{tbg_opacity}.png'
-        trophy_bg = Image.open(trophy_bg_path).convert("RGBA")
-
-        final = Image.alpha_composite(img, trophy_bg.resize(img.size))
-        return final
-
-    def _cache_trophy_image(self, name: str, theme_name: str) -> Image:
-        if name is None:
-            name = f'none-{theme_name}'
-            path = f'resources/profiles/layout/{theme_name}/trophy-blank.png'
-        else:
-            path = 'resources/profiles/trophies/{}.png'.format(name)
-
-        if not name in self.trophyImgCache:
-            self.trophyImgCache[name] = Image.open(path).convert("RGBA")
-
-        return self.trophyImgCache[name]
+    async def _render(self, func: typing.Callable, *args):
+        '''Run a profile_render function in the worker pool, replacing the pool once if a worker has died'''
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.renderPool, func, *args)
 
-    def _cache_border_image(self, name: str) -> Image:
-        if not name in self.borderImgCache:
-            self.borderImgCache[name] = Image.open('resources/profiles/borders/{}.png'.format(name)).convert("RGBA")
+        except BrokenProcessPool:
+            logging.error('[Social] Profile render pool broke, restarting it')
+            self.renderPool.shutdown(wait=False)
+            self.renderPool = self._create_render_pool()
+            return await loop.run_in_executor(self.renderPool, func, *args)
 
-        return self.borderImgCache[name]
+    async def _cache_game_img(self, deku_id: str, prefetch: bool = False) -> typing.Optional[bytes]:
+        '''Returns a resized game icon PNG for the renderer, or None to use the theme's missing image'''
+        gamesCog = self.bot.get_cog('Games')
+        if not gamesCog:
+            return None
 
-    def _cache_flag_image(self, name) -> Image:
-        SHADOW_OFFSET = 2
+        url = await gamesCog.get_image(deku_id, as_url=True)
+        if not url:
+            return None
 
-        if not name in self.flagImgCache:
-            regionImg = Image.open(self.twemojiPath + name + '.png').convert('RGBA')
+        key = self._game_icon_key(deku_id, url)
+        gameIcon = self.gameIconCache.get(key)
+        if gameIcon is not None:
+            return gameIcon
 
-            # Drop Shadow
-            shadowData = np.array(regionImg)
-            shadowData[..., :-1] = (128, 128, 128)  # Set RGB but not alpha for all pixels
-            shadowImg = Image.fromarray(shadowData)
+        if prefetch and key in self.gameIconDiskCache:
+            return None  # Already on disk, don't push more recently used icons out of memory
 
-            # Combine shadow
-            w, h = regionImg.size
-            img = Image.new('RGBA', (w + SHADOW_OFFSET, h + SHADOW_OFFSET), (0, 0, 0, 0))
-            img.paste(shadowImg, (SHADOW_OFFSET, SHADOW_OFFSET), shadowImg)
-            img.paste(regionImg, (0, 0), regionImg)
+        gameIcon = await asyncio.get_running_loop().run_in_executor(None, self.gameIconDiskCache.get, key)
+        if gameIcon is None:
+            if time.time() < self.gameIconRetry.get(key, 0):
+                return None
 
-            self.flagImgCache[name] = img
+            try:
+                gameIcon = await self._render(profile_render.resize_game_icon, await gamesCog.fetch_image(url))
 
-        return self.flagImgCache[name]
+            except Exception as e:
+                logging.error(f'[Social] Error caching game icon for {deku_id}', exc_info=e)
+                self.gameIconRetry[key] = time.time() + 60 * 60  # Retry in an hour
+                return None
 
-    async def _cache_game_img(self, deku_id: str, theme) -> Image:
-        EXPIRY, IMAGE = 0, 1
-        do_recache = False
+            self.gameIconRetry.pop(key, None)
+            await asyncio.get_running_loop().run_in_executor(None, self.gameIconDiskCache.put, key, gameIcon)
 
-        if deku_id in self.gameImgCache:
-            if time.time() > self.gameImgCache[deku_id][EXPIRY]:  # Expired in cache
-                do_recache = True
-        else:  # Not in cache
-            do_recache = True
+        if not prefetch:
+            self.gameIconCache.put(key, gameIcon)
 
-        if do_recache:
-            if not self.Games:
-                return theme['missingImage']
+        return gameIcon
 
-            try:
-                gameImg = await self.Games.get_image(deku_id)
+    @staticmethod
+    def _game_icon_key(deku_id: str, url: str) -> str:
+        return f'{deku_id}-{hashlib.sha1(url.encode()).hexdigest()[:16]}'  # A new image URL is a new key
 
-                if gameImg:
-                    gameIcon = Image.open(gameImg).convert('RGBA').resize((120, 120))
-                else:
-                    gameIcon = None
+    async def prefetch_game_icons(self):
+        '''Download icons for the top games and every game set on a profile, so first views after a restart are fast'''
+        gamesCog = self.bot.get_cog('Games')
+        if not gamesCog:
+            return
 
-            except Exception as e:
-                logging.error('Error caching game icon', exc_info=e)
-                gameIcon = None
+        gameIds = [game['deku_id'] for game in gamesCog.topGames or []]
+        gameIds += await mclient.bowser.users.distinct('favgames')
+        gameIds = list(dict.fromkeys(gameIds))
 
-            self.gameImgCache[deku_id] = (time.time() + 60 * 60 * 48, gameIcon)  # Expire in 48 hours
+        for i in range(0, len(gameIds), 16):  # Concurrency per host is also limited by the Games session
+            await asyncio.gather(*(self._cache_game_img(deku_id, prefetch=True) for deku_id in gameIds[i : i + 16]))
 
-        if self.gameImgCache[deku_id][IMAGE] is None:
-            return theme['missingImage']
+        logging.info(f'[Social] Prefetched icons for {len(gameIds)} games')
 
-        return self.gameImgCache[deku_id][IMAGE]
+    async def _generate_background_preview(
+        self, backgrounds, requester: int = 0, priority: int = RenderScheduler.INTERACTIVE
+    ) -> discord.File:
+        key = tuple(backgrounds)  # Grid order follows the select menu, so the key keeps it
+        preview = self.previewCache.get(key)
+        if preview is None:
 
-    def _generate_background_preview(self, backgrounds) -> discord.File:
-        # square_length: Gets smallest square dimensions that will fit length of backgrounds, ie len 17 -> 25
-        square_length = math.ceil(math.sqrt(len(backgrounds)))
+            async def render():
+                preview = await self._render(profile_render.render_background_preview, list(backgrounds))
+                self.previewCache.put(key, preview)
+                return preview
 
-        # rows_required is used to chop the bottom off, i.e. 2 bgs have a 2x2 w/ square_length but we only need 2x1
-        rows_required = math.ceil(len(backgrounds) / square_length)
+            preview = await self.renderScheduler.submit(('preview', key), requester, priority, render)
 
-        canvas = Image.new('RGBA', (1600 * square_length, 900 * rows_required), (0, 0, 0, 0))
+        return discord.File(io.BytesIO(preview), filename=self._attachment_name('preview'))
 
-        for i, name in enumerate(backgrounds):
-            background = self.backgrounds[name]
-            theme = self.themes[background["theme"]]
+    async def _lookup_profile_games(self, setGames: list) -> typing.List[typing.Tuple[str, str, typing.Optional[str]]]:
+        '''
+        The deku_id, name and icon key of each favorite game that will be drawn, skipping any that are unknown. Games
+        without an image have no icon key and are drawn with the theme's missing image
+        '''
+        games = []
+        gamesCog = self.bot.get_cog('Games')
+        if not setGames or not gamesCog:
+            return games
 
-            image = theme['pfpBackground'].copy()
-            draw = ImageDraw.Draw(image)
+        setGames = list(dict.fromkeys(setGames))  # Remove duplicates from list, just in case
+        for game_deku_id in setGames[:5]:  # Limit to 5 results, just in case
+            gameName = await gamesCog.get_name(game_deku_id)
 
-            image.paste(background["image"], mask=background["image"])
-            image.paste(theme['profileStatic'], mask=theme['profileStatic'])
-            self._draw_text(draw, (350, 215), name, theme["primary"], self.profileFonts['user'])
+            if not gameName:
+                continue
 
-            paste_at = (i % square_length * 1600, i // square_length * 900)
-            canvas.paste(image, paste_at, image)
+            url = await gamesCog.get_image(game_deku_id, as_url=True)
+            games.append((game_deku_id, gameName, self._game_icon_key(game_deku_id, url) if url else None))
 
-        new_height = round((rows_required / square_length) * 900)
-        canvas = canvas.resize((1600, new_height))
+        return games
 
-        bytesFile = io.BytesIO()
-        canvas.save(bytesFile, format='PNG')
-        return discord.File(io.BytesIO(bytesFile.getvalue()), filename='preview.png')
+    async def _resolve_profile_games(self, setGames: list) -> typing.List[typing.Tuple[str, typing.Optional[bytes]]]:
+        '''Look up the names and icons of favorite games ahead of rendering, skipping any that are unknown'''
+        return [
+            (gameName, await self._cache_game_img(deku_id))
+            for deku_id, gameName, _ in await self._lookup_profile_games(setGames)
+        ]
 
-    async def _generate_profile_card_from_member(self, member: discord.Member) -> discord.File:
+    async def _generate_profile_card_from_member(
+        self,
+        member: discord.Member,
+        requester: typing.Optional[int] = None,
+        priority: int = RenderScheduler.INTERACTIVE,
+    ) -> discord.File:
         db = mclient.bowser.users
-        dbUser = db.find_one({'_id': member.id})
+        dbUser = await db.find_one({'_id': member.id})
 
         if 'default' in dbUser['backgrounds']:
             backgrounds = list(dbUser['backgrounds'])
@@ -425,15 +454,12 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
             backgrounds.insert(0, 'default-dark')
             backgrounds.insert(0, 'default-light')
 
-            db.update_one({'_id': member.id}, {'$set': {'backgrounds': backgrounds}})
+            await db.update_one({'_id': member.id}, {'$set': {'backgrounds': backgrounds}})
 
             if dbUser['background'] == 'default':
-                db.update_one({'_id': member.id}, {'$set': {'background': 'default-light'}})
-
-            dbUser = db.find_one({'_id': member.id})
+                await db.update_one({'_id': member.id}, {'$set': {'background': 'default-light'}})
 
-        ## Get avatar ##
-        pfpBytes = io.BytesIO(await member.display_avatar.with_format('png').with_size(256).read())
+            dbUser = await db.find_one({'_id': member.id})
 
         ## Get message count, games ##
         if member.id in self.easter_egg_games:
@@ -444,7 +470,9 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
             setGames = list(dict.fromkeys(setGames))  # Remove duplicates from list, just in case
             setGames = setGames[0:5]  # Limit to 5 results, just in case
 
-            message_count = f'{mclient.bowser.messages.count_documents({"author": member.id}):,}'
+            activity = await mclient.bowser.user_activity.find_one({'_id': member.id}, {'messages': 1})
+            messages = 0 if not activity else activity['messages']
+            message_count = f'{messages:,}'
 
         ## Get join date ##
         joins = dbUser['joins']
@@ -490,232 +518,118 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
             trophies.append(None)
 
         profile = {
-            'pfp': Image.open(pfpBytes),
+            'pfp': None,
             'display_name': member.display_name,
             'username': str(member),
             'regionFlag': dbUser['regionFlag'],
             'friendcode': dbUser['friendcode'],
             'message_count': message_count,
             'joindate': joinDateF,
-            'usertime': usertime,
+            'usertime': None if dbUser['timezone'] else usertime,  # A clock is drawn after the cached layer
             'trophies': trophies,
-            'games': setGames,
+            'games': None,
         }
 
-        return await self._generate_profile_card(profile, self.backgrounds[dbUser['background']])
-
-    async def _generate_profile_card(self, profile: dict, background: dict) -> discord.File:
-        theme = self.themes[background["theme"]]
-
-        pfp = profile['pfp'].convert("RGBA").resize((250, 250))
-
-        card = theme['pfpBackground'].copy()
-        card.paste(pfp, (50, 170), pfp)
-        card.paste(background["image"], mask=background["image"])
-        card.paste(theme['profileStatic'], mask=theme['profileStatic'])
-
-        draw = ImageDraw.Draw(card)
-        fonts = self.profileFonts
-
-        # userinfo
-        memberName = ''
-        nameW = 350
-
-        # Member name may be rendered in parts, so we want to ensure the font stays the same for the entire thing
-        member_name_font = fonts['user'][self._determine_cjk_font(profile['display_name'])]
-
-        for char in profile['display_name']:
-            if char not in emoji_data.EmojiSequence:
-                memberName += char
-
-            else:
-                if memberName:
-                    W, _ = draw.textsize(memberName, font=member_name_font)
-                    draw.text((nameW, 215), memberName, tuple(theme["primary"]), member_name_font)
-                    nameW += W
-                    memberName = ''
-
-                charset = tuple(codepoints.from_unicode(char))
-                unicodePoint = []
-                for x in charset:
-                    unicodePoint.append(hex(x)[2:])
-
-                unicodeChar = '-'.join(unicodePoint)
-                emojiPic = Image.open(self.twemojiPath + unicodeChar + '.png').convert('RGBA').resize((40, 40))
-                card.paste(emojiPic, (nameW + 3, 228), emojiPic)
-                nameW += 46
-
-        if memberName:  # Leftovers, text
-            draw.text((nameW, 215), memberName, tuple(theme["primary"]), member_name_font)
-
-        self._draw_text(draw, (350, 275), profile['username'], theme["secondary"], fonts['subtext'])
-
-        if profile['regionFlag']:
-            regionImg = self._cache_flag_image(profile['regionFlag'])
-            card.paste(regionImg, (976, 50), regionImg)
-
-        # Friend code
-        if profile['friendcode']:
-            self._draw_text(draw, (350, 330), profile['friendcode'], theme["friend_code"], fonts['subtext'])
-
-        self._draw_text(draw, (435, 490), profile['message_count'], theme["primary"], fonts['medium'])
-        self._draw_text(draw, (60, 490), profile['joindate'], theme["primary"], fonts['medium'])
-        self._draw_text(draw, (790, 490), profile['usertime'], theme["primary"], fonts['medium'])
-
-        # Start trophies
-        trophyLocations = {
-            0: (60, 630),
-            1: (171, 630),
-            2: (283, 630),
-            3: (394, 630),
-            4: (505, 630),
-            5: (616, 630),
-            6: (728, 630),
-            7: (839, 630),
-            8: (950, 630),
-            9: (60, 745),
-            10: (171, 745),
-            11: (283, 745),
-            12: (394, 745),
-            13: (505, 745),
-            14: (616, 745),
-            15: (728, 745),
-            16: (839, 745),
-            17: (950, 745),
+        ## Serve from cache if nothing that is drawn has changed ##
+        games = await self._lookup_profile_games(setGames)
+        profile['games'] = [(gameName, iconKey) for _, gameName, iconKey in games]
+        cacheKey = self._card_cache_key(profile, dbUser['background'], member.display_avatar.key)
+        card = await self._get_cached_card(cacheKey)
+        if card is None:
+
+            async def render():
+                profile['pfp'] = await self._get_avatar(member)
+                profile['games'] = []
+                complete = True
+                for deku_id, gameName, iconKey in games:
+                    gameIcon = await self._cache_game_img(deku_id)
+                    complete &= gameIcon is not None or iconKey is None
+                    profile['games'].append((gameName, gameIcon))
+
+                card = await self._render(
+                    profile_render.render_profile_card, {**profile, 'background': dbUser['background']}
+                )
+                if complete:  # An icon that failed to download is drawn as the missing image, so don't keep it
+                    await self._store_cached_card(cacheKey, member.id, card)
+
+                return card
+
+            card = await self.renderScheduler.submit(cacheKey, requester or member.id, priority, render)
+
+        if dbUser['timezone']:
+            layer = card
+
+            async def stamp():
+                return await self._render(profile_render.stamp_profile_time, layer, dbUser['background'], usertime)
+
+            card = await self.renderScheduler.submit((cacheKey, usertime), requester or member.id, priority, stamp)
+
+        return discord.File(io.BytesIO(card), filename=self._attachment_name('card'))
+
+    async def _get_avatar(self, member: discord.Member) -> bytes:
+        '''
+        A member's avatar as the 250x250 RGBA pixels drawn on the card. The avatar key is a hash that changes along
+        with the avatar, so cached entries never go stale
+        '''
+        key = member.display_avatar.key
+        avatar = self.avatarCache.get(key)
+        if avatar is None:
+            data = await member.display_avatar.with_format('png').with_size(256).read()
+            avatar = await self._render(profile_render.resize_avatar, data)
+            self.avatarCache.put(key, avatar)
+
+        return avatar
+
+    def _card_cache_key(self, profile: dict, background: str, avatar: str) -> str:
+        '''Hash of everything drawn on a member's profile card, with games as their names and icon keys'''
+        inputs = {
+            **{k: v for k, v in profile.items() if k not in ['pfp', 'games']},
+            'games': list(profile['games']),
+            'background': background,
+            'avatar': avatar,
+            'version': profile_render.RENDER_VERSION,
+            'encoder': self.encoder['card'],
         }
-        trophyNum = 0
-        useBorder = None
-        for x in profile['trophies']:
-            if useBorder is None and x in self.borders['trophy_borders']:
-                useBorder = self.borders['trophy_borders'][x]
-
-            trophyBadge = self._cache_trophy_image(x, background["theme"])
-            card.paste(trophyBadge, trophyLocations[trophyNum], trophyBadge)
-            trophyNum += 1
-
-        # border!
-        useBorder = useBorder or self.borders['default']
-        border = self._cache_border_image(useBorder)
-        card.paste(border, (0, 0), border)
-
-        # Start favorite games
-        gameIconLocations = {0: (1150, 130), 1: (1150, 280), 2: (1150, 430), 3: (1150, 580), 4: (1150, 730)}
-        gameTextLocations = {0: 130, 1: 280, 2: 430, 3: 580, 4: 730}
-
-        setGames = profile['games']
-        gameCount = 0
-        if setGames:
-            setGames = list(dict.fromkeys(setGames))  # Remove duplicates from list, just in case
-            setGames = setGames[:5]  # Limit to 5 results, just in case
-
-            for game_deku_id in setGames:
-                if not self.Games:
-                    continue
-
-                gameName = self.Games.get_name(game_deku_id)
-
-                if not gameName:
-                    continue
-
-                gameIcon = await self._cache_game_img(game_deku_id, theme)
-                card.paste(gameIcon, gameIconLocations[gameCount], gameIcon)
-
-                nameW = 1285
-                nameWMax = 1525
-
-                game_name_font = fonts['medium'][self._determine_cjk_font(gameName)]
-
-                # Word wrap logic with overflow protection
-                words = gameName.split()
-                lines = []
-                current_line = []
-                current_w = 0
-
-                # Use nameW as the starting X coordinate for all lines
-                start_x = nameW
-                max_w = nameWMax - start_x
-                space_w = game_name_font.getsize(' ')[0]
-
-                for word in words:
-                    word_w = game_name_font.getsize(word)[0]
-
-                    # Handle massive words that don't fit on a single line
-                    if word_w > max_w:
-                        if current_line:
-                            lines.append(' '.join(current_line))
-                            current_line = []
-                            current_w = 0
-
-                        # Split the long word by character
-                        partial_word = ""
-                        partial_w = 0
-                        for char in word:
-                            char_w = game_name_font.getsize(char)[0]
-                            if partial_w + char_w > max_w:
-                                lines.append(partial_word)
-                                partial_word = char
-                                partial_w = char_w
-                            else:
-                                partial_word += char
-                                partial_w += char_w
-
-                        if partial_word:
-                            current_line = [partial_word]
-                            current_w = partial_w + space_w
-
-                    # Handle normal words
-                    elif current_w + word_w <= max_w:
-                        current_line.append(word)
-                        current_w += word_w + space_w
-                    else:
-                        if current_line:
-                            lines.append(' '.join(current_line))
-                        current_line = [word]
-                        current_w = word_w + space_w
-
-                if current_line:
-                    lines.append(' '.join(current_line))
-
-                # Safety: Limit to 3 lines and trim for ellipsis
-                if len(lines) > 3:
-                    lines = lines[:3]
-                    ellipsis = "..."
-                    ellipsis_w = game_name_font.getsize(ellipsis)[0]
-
-                    # Shrink the last line until "..." fits
-                    while lines[-1]:
-                        current_line_w = game_name_font.getsize(lines[-1])[0]
-                        if current_line_w + ellipsis_w <= max_w:
-                            break
-                        lines[-1] = lines[-1][:-1]  # Remove last char
-
-                    lines[-1] += ellipsis
-
-                # Safety: Limit to 3 lines
-                if len(lines) > 3:
-                    lines = lines[:3]
-                    lines[-1] += "..."
-
-                # Draw the wrapped lines
-                # Use gameTextLocations[gameCount] as the starting Y
-                y_pos = gameTextLocations[gameCount]
-
-                for line in lines:
-                    # Draw text at the stored start_x
-                    draw.text((start_x, y_pos), line, tuple(theme["primary"]), font=game_name_font)
-                    y_pos += 40  # Increase height by 40px for next line
-
-                gameCount += 1
-        if gameCount == 0:  # No games rendered
-            self._draw_text(draw, (1150, 130), 'Not specified', theme["secondary_heading"], fonts['medium'])
-
-        bytesFile = io.BytesIO()
-        card.save(bytesFile, format='PNG')
-        return discord.File(io.BytesIO(bytesFile.getvalue()), filename='profile.png')
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    async def _get_cached_card(self, key: str) -> typing.Optional[bytes]:
+        card = self.cardCache.get(key)
+        if card is None:
+            card = await asyncio.get_running_loop().run_in_executor(None, self.cardDiskCache.get, key)
+            if card is not None:
+                self.cardCache.put(key, card)
+
+        return card
+
+    async def _store_cached_card(self, key: str, user_id: int, card: bytes):
+        self.cardCache.put(key, card)
+        self.cardCacheKeys[user_id].add(key)
+        await asyncio.get_running_loop().run_in_executor(None, self.cardDiskCache.put, key, card)
+
+    def invalidate_profile_card(self, user_id: int):
+        '''Drop cached cards for a user after their profile has been changed'''
+        keys = self.cardCacheKeys.pop(user_id, set())
+        for key in keys:
+            self.cardCache.pop(key)
+
+        def delete():
+            for key in keys:
+                self.cardDiskCache.delete(key)
+
+        if keys:
+            asyncio.get_running_loop().run_in_executor(None, delete)
+
+    async def _generate_profile_card(self, profile: dict, background: typing.Union[str, dict]) -> discord.File:
+        '''
+        Render a profile card in the worker pool. `background` is either a slug from backgrounds.yml or, when validating
+        a new background, a dict of raw PNG `image` bytes, `theme` and `trophy-bg-opacity`
+        '''
+        card = await self._render(profile_render.render_profile_card, {**profile, 'background': background})
+        return discord.File(io.BytesIO(card), filename=self._attachment_name('card'))
 
     async def modify_trivia_level(self, member: discord.Member, regress=False):
         db = mclient.bowser.users
-        dbUser = db.find_one({'_id': member.id})
+        dbUser = await db.find_one({'_id': member.id})
         currentLevel = 0
 
         for t in dbUser['trophies']:
@@ -787,7 +701,7 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
         embed.set_footer(text='❔You can see this info again anytime if you run the /profile edit command')
 
         main_img = await self._generate_profile_card_from_member(member)
-        embed.set_image(url='attachment://profile.png')
+        embed.set_image(url=f'attachment://{self._attachment_name("card")}')
 
         commandID = 0
         for command in self.bot.tree.get_commands(guild=discord.Object(id=config.nintendoswitch)):
@@ -874,12 +788,15 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
                     f'{config.redTick} The Nintendo Switch friend code you provided is invalid, please try again. The format of a friend code is `SW-0000-0000-0000`, with the zeros replaced with the numbers from your unique code'
                 )
 
-            db.update_one({'_id': interaction.user.id}, {'$set': {'friendcode': friendcode, 'profileSetup': True}})
+            await db.update_one(
+                {'_id': interaction.user.id}, {'$set': {'friendcode': friendcode, 'profileSetup': True}}
+            )
+            self.invalidate_profile_card(interaction.user.id)
 
             msg = f'{config.greenTick} Your friend code has been successfully updated on your profile card! Here\'s how it looks:'
 
             # Duplicate friend code detection
-            duplicates = db.find({'_id': {'$ne': interaction.user.id}, 'friendcode': friendcode})
+            duplicates = await db.find({'_id': {'$ne': interaction.user.id}, 'friendcode': friendcode}).to_list()
 
             if duplicates:
                 # Check if accounts with matching friend codes have infractions on file
@@ -887,7 +804,7 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
                 hasPuns = False
                 otherUsers = []
                 for u in duplicates:
-                    if punsDB.count_documents({'user': u['_id']}):
+                    if await punsDB.count_documents({'user': u['_id']}):
                         hasPuns = True
 
                     if interaction.user.id != u['_id']:
@@ -933,13 +850,17 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
                 f'{config.redTick} You didn\'t provide a valid supported emoji that represents a flag -- make sure you are providing an emoji, not an abbreviation or text. Please try again; note you can only use emoji like a country\'s flag or extras such as the pirate and gay pride flags'
             )
 
-        db.update_one({'_id': interaction.user.id}, {'$set': {'regionFlag': pointStr, 'profileSetup': True}})
+        await db.update_one({'_id': interaction.user.id}, {'$set': {'regionFlag': pointStr, 'profileSetup': True}})
+        self.invalidate_profile_card(interaction.user.id)
         await interaction.followup.send(
             f'{config.greenTick} Your flag has been successfully updated on your profile card! Here\'s how it looks:',
             file=await self._generate_profile_card_from_member(interaction.user),
         )
 
     async def _profile_timezone_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await tools.autocompleter.run(interaction, 'timezones', current, self._profile_timezone_choices)
+
+    async def _profile_timezone_choices(self, current: str):
         if current:
             extraction = process.extract(current.lower(), pytz.all_timezones, limit=9)
             return [app_commands.Choice(name=e[0], value=e[0]) for e in extraction]
@@ -959,7 +880,8 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
         db = mclient.bowser.users
         for tz in pytz.all_timezones:
             if timezone.lower() == tz.lower():
-                db.update_one({'_id': interaction.user.id}, {'$set': {'timezone': tz, 'profileSetup': True}})
+                await db.update_one({'_id': interaction.user.id}, {'$set': {'timezone': tz, 'profileSetup': True}})
+                self.invalidate_profile_card(interaction.user.id)
                 return await interaction.followup.send(
                     f'{config.greenTick} Your timezone has been successfully updated on your profile card! Here\'s how it looks:',
                     file=await self._generate_profile_card_from_member(interaction.user),
@@ -970,7 +892,11 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
         )
 
     async def _profile_games_autocomplete(self, interaction: discord.Interaction, current: str):
-        return await self.Games._games_search_autocomplete(interaction, current)
+        gamesCog = self.bot.get_cog('Games')
+        if not gamesCog:
+            return []
+
+        return await gamesCog._games_search_autocomplete(interaction, current)
 
     @social_group.command(name='games', description='Pick up-to 5 of your fav Nintendo Switch games to show them off')
     @app_commands.describe(
@@ -998,22 +924,20 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
     ):
         await interaction.response.defer(ephemeral=True)
 
-        db = mclient.bowser.games
+        gamesCog = self.bot.get_cog('Games')
+        if not gamesCog:
+            return await interaction.followup.send(
+                f'{config.redTick} Game search is currently unavailable. Please wait a bit, then try again'
+            )
 
         # If user selected an auto-complete result, we will be provided the deku_id automatically which saves effort
         flagConfirmation = False
         gameList = []
-        doc1 = db.find_one({'deku_id': game1})
-        doc2 = None if not game2 else db.find_one({'deku_id': game2})
-        doc3 = None if not game3 else db.find_one({'deku_id': game3})
-        doc4 = None if not game4 else db.find_one({'deku_id': game4})
-        doc5 = None if not game5 else db.find_one({'deku_id': game5})
-
         games = [game1, game2, game3, game4, game5]
-        documents = [doc1, doc2, doc3, doc4, doc5]
+        documents = [gamesCog.get_game(game) if game else None for game in games]
 
         def resolve_document(game_name: str):
-            return self.Games.search(game_name)
+            return gamesCog.search(game_name)
 
         async def return_failure(interaction: discord.Interaction, game_name: str):
             return await interaction.followup.send(
@@ -1032,7 +956,7 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
             if not document:
                 return await return_failure(interaction, games[idx])
 
-            gameList.append(document['deku_id'])
+            gameList.append(document['deku_id'] if isinstance(document, dict) else document.deku_id)
 
         msg = None
         if flagConfirmation:
@@ -1041,7 +965,7 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
                 title='Are these games correct?', description='*Use the buttons below to confirm*', color=0xF5FF00
             )
             for idx, game in enumerate(gameList):
-                embed.add_field(name=f'Game {idx + 1}', value=db.find_one({'deku_id': game})['name'])
+                embed.add_field(name=f'Game {idx + 1}', value=gamesCog.get_game(game).name)
 
             view = tools.NormalConfirmation(timeout=90.0)
             view.message = await interaction.followup.send(
@@ -1068,7 +992,13 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
 
         # We are good to commit changes
         userDB = mclient.bowser.users
-        userDB.update_one({'_id': interaction.user.id}, {'$set': {'favgames': gameList}})
+        previous = await userDB.find_one_and_update(
+            {'_id': interaction.user.id}, {'$set': {'favgames': gameList}}, projection={'favgames': 1}
+        )
+        gamesCog = self.bot.get_cog('Games')  # Looked up again, the module may have reloaded during confirmation
+        if gamesCog:
+            gamesCog.update_favourites(previous.get('favgames') if previous else None, gameList)
+        self.invalidate_profile_card(interaction.user.id)
         message_reply = f'{config.greenTick} Your favorite games list has been successfully updated on your profile card! Here\'s how it looks:'
 
         if msg:
@@ -1119,7 +1049,8 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
                 if s.values:
                     value = s.values[0]
                     db = mclient.bowser.users
-                    db.update_one({'_id': interaction.user.id}, {'$set': {'background': value}})
+                    await db.update_one({'_id': interaction.user.id}, {'$set': {'background': value}})
+                    self.Parent.invalidate_profile_card(interaction.user.id)
 
                     await self.message.delete()
                     await interaction.response.send_message(
@@ -1157,7 +1088,7 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
         await interaction.response.defer(ephemeral=True)
 
         db = mclient.bowser.users
-        user = db.find_one({'_id': interaction.user.id})
+        user = await db.find_one({'_id': interaction.user.id})
         bg = user['background']
 
         choices = []
@@ -1181,10 +1112,13 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
             '**Let\'s Choose a New Profile Background**\nUsing the select menus below, you can choose a new profile background!'
             f' You currently you access to:\n\n> {human_backgrounds}\nExamples of all these backgrounds are:'
         )
-        embed.set_image(url='attachment://preview.png')
+        embed.set_image(url=f'attachment://{self._attachment_name("preview")}')
 
         msg = await interaction.followup.send(
-            embeds=[embed], file=self._generate_background_preview(backgrounds), view=view, wait=True
+            embeds=[embed],
+            file=await self._generate_background_preview(backgrounds, requester=interaction.user.id),
+            view=view,
+            wait=True,
         )
         view.message = msg
         # await view.wait()
@@ -1210,16 +1144,22 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
         db = mclient.bowser.users
         msg = f'Your {element.lower()} {elementKeyPairs[element][1]} been removed from your profile successfully'
         if element == 'Favorite Games':
-            db.update_one({'_id': interaction.user.id}, {'$set': {'favgames': []}})
+            previous = await db.find_one_and_update(
+                {'_id': interaction.user.id}, {'$set': {'favgames': []}}, projection={'favgames': 1}
+            )
+            gamesCog = self.bot.get_cog('Games')
+            if gamesCog:  # Otherwise the tally is recounted when the games module loads
+                gamesCog.update_favourites(previous.get('favgames') if previous else None, [])
 
         elif element == 'Background':
-            db.update_one({'_id': interaction.user.id}, {'$set': {'background': 'default-light'}})
+            await db.update_one({'_id': interaction.user.id}, {'$set': {'background': 'default-light'}})
             msg += ', and has been set to `Default Light` theme. '
 
         else:
-            db.update_one({'_id': interaction.user.id}, {'$set': {elementKeyPairs[element][0]: None}})
+            await db.update_one({'_id': interaction.user.id}, {'$set': {elementKeyPairs[element][0]: None}})
             msg += '. '
 
+        self.invalidate_profile_card(interaction.user.id)
         msg += 'Here\'s how it looks:'
         await interaction.followup.send(msg, file=await self._generate_profile_card_from_member(interaction.user))
 
@@ -1229,7 +1169,7 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
     async def _profile_edit(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         db = mclient.bowser.users
-        u = db.find_one({'_id': interaction.user.id})
+        u = await db.find_one({'_id': interaction.user.id})
         embed, card = await self.generate_user_flow_embed(interaction.user, new_user=not u['profileSetup'])
         await interaction.followup.send(embed=embed, file=card)
 
@@ -1264,7 +1204,8 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
                 ephemeral=True,
             )
 
-        bg_raw_img = Image.open(io.BytesIO(await attach.read())).convert("RGBA")
+        bg_raw_bytes = await attach.read()
+        bg_raw_img = Image.open(io.BytesIO(bg_raw_bytes)).convert("RGBA")
 
         # Check mask
         alpha_test_mask = Image.open("resources/profiles/background-test-mask.png").convert("RGBA")
@@ -1288,15 +1229,10 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
             )
         # end check mask
 
-        try:
-            bg_rendered = self._render_background_image(bg_raw_img, theme, bg_opacity)
-        except ValueError as e:
-            return await interaction.followup.send(f'{config.redTick} {e}', ephemeral=True)
-
-        background = {'image': bg_rendered, 'theme': theme}
+        background = {'image': bg_raw_bytes, 'theme': theme, 'trophy-bg-opacity': bg_opacity}
 
         profile = {
-            'pfp': Image.new('RGB', (250, 250)),
+            'pfp': None,
             'display_name': "Lorem Ipsum Dolor Sit Amet, Esq",
             'username': "lorem_ipsum_dolor_sit_amet_esq",
             'regionFlag': "1f3f4-200d-2620-fe0f",  # Pirate flag
@@ -1313,8 +1249,13 @@ class SocialFeatures(commands.Cog, name='Social Commands'):
                 '5b8bb732-f2fa-4964-a8f4-d102772506c5',  # Prinny Presents NIS Classics Volume 2: Makai Kingdom: ...
             ],  # Games with really long titles
         }
+        profile['games'] = await self._resolve_profile_games(profile['games'])
+
+        try:
+            card = await self._generate_profile_card(profile, background)
+        except ValueError as e:
+            return await interaction.followup.send(f'{config.redTick} {e}', ephemeral=True)
 
-        card = await self._generate_profile_card(profile, background)
         cfgstr = f"```yml\n{safefilename}:\n    theme: {theme}\n    trophy-bg-opacity: {bg_opacity}```"
 
         await interaction.followup.send(cfgstr, file=card)
@@ -1,24 +1,73 @@
 import asyncio
+import collections
 import logging
-import time
 import typing
 from datetime import date, datetime, timedelta, timezone
 
 import config
 import discord
-import pymongo
+import numpy as np
 import pytz
 from discord import app_commands
 from discord.ext import commands
 
+import database
 import tools
 
-mclient = pymongo.MongoClient(config.mongoURI)
+mclient = database.client()
+
+
+class MemberFlow:
+    '''
+    Join and leave timestamps from bowser.member_flow held as sorted arrays, so counting the events in any window is
+    two binary searches. Only events added since the last refresh are fetched.
+    '''
+
+    def __init__(self):
+        self.joins = np.empty(0, dtype=np.float64)
+        self.leaves = np.empty(0, dtype=np.float64)
+        self.lastId = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self):
+        async with self._lock:
+            query = {'_id': {'$gt': self.lastId}} if self.lastId else {}
+            joins = []
+            leaves = []
+            async for event in mclient.bowser.member_flow.find(query, {'type': 1, 'timestamp': 1}).sort('_id', 1):
+                (joins if event['type'] == 'join' else leaves).append(event['timestamp'])
+                self.lastId = event['_id']
+
+            self.joins = self._merge(self.joins, joins)
+            self.leaves = self._merge(self.leaves, leaves)
+
+    @staticmethod
+    def _merge(existing: np.ndarray, new: list) -> np.ndarray:
+        if not new:
+            return existing
+
+        new = np.sort(np.asarray(new, dtype=np.float64))
+        merged = np.concatenate((existing, new))
+        if existing.size and new[0] < existing[-1]:
+            merged.sort(kind='mergesort')  # Backfilled history arrived out of order
+
+        return merged
+
+    def count(self, start: float, end: float) -> typing.Tuple[int, int]:
+        '''Number of joins and leaves with start <= timestamp < end'''
+        return tuple(
+            int(np.searchsorted(events, end, side='left') - np.searchsorted(events, start, side='left'))
+            for events in (self.joins, self.leaves)
+        )
 
 
 class StatCommands(commands.Cog, name='Statistic Commands'):
     def __init__(self, bot):
         self.bot = bot
+        self.memberFlow = MemberFlow()
+
+    async def cog_load(self):
+        self.bot.loop.create_task(self.memberFlow.refresh())
 
     @app_commands.guilds(discord.Object(id=config.nintendoswitch))
     @app_commands.default_permissions(view_audit_log=True)
@@ -57,7 +106,7 @@ class StatCommands(commands.Cog, name='Statistic Commands'):
                 if not start
                 else datetime.strptime(start, '%Y-%m-%d').replace(tzinfo=pytz.UTC)
             )
-            searchDate = searchDate.replace(hour=0, minute=0, second=0)
+            searchDate = searchDate.replace(hour=0, minute=0, second=0, microsecond=0)
             endDate = (
                 searchDate + timedelta(days=30)
                 if not end
@@ -70,80 +119,49 @@ class StatCommands(commands.Cog, name='Statistic Commands'):
                 content=f'{config.redTick} Invalid date provided. Please make sure it is in the format of `yyyy-mm-dd`'
             )
 
-        if not start:
-            query = {'timestamp': {'$gte': (int(time.time()) - (60 * 60 * 24 * 30))}}
-            messages = mclient.bowser.messages.find(query)
-
-        else:
-            if endDate <= searchDate:
-                return await interaction.edit_original_response(
-                    content=f'{config.redTick} Invalid dates provided. The end date cannot be before the starting date. `/stats server [starting date] [ending date]`'
-                )
-
-            query = {'timestamp': {'$gte': searchDate.timestamp(), '$lte': endDate.timestamp()}}
-            messages = mclient.bowser.messages.find(query)
-
-        msgCount = mclient.bowser.messages.count_documents(query)
-        channelCounts = {}
-        userCounts = {}
-        for message in messages:
-            if message['channel'] not in channelCounts.keys():
-                channelCounts[message['channel']] = 1
-
-            else:
-                channelCounts[message['channel']] += 1
-
-            if message['author'] not in userCounts.keys():
-                userCounts[message['author']] = 1
-
-            else:
-                userCounts[message['author']] += 1
-
-        if not start:
-            puns = mclient.bowser.puns.count_documents(
-                {
-                    'timestamp': {'$gte': (int(time.time()) - (60 * 60 * 24 * 30))},
-                    'type': {'$nin': ['unmute', 'unblacklist', 'note']},
-                }
+        if start and endDate <= searchDate:
+            return await interaction.edit_original_response(
+                content=f'{config.redTick} Invalid dates provided. The end date cannot be before the starting date. `/stats server [starting date] [ending date]`'
             )
 
-        else:
-            puns = mclient.bowser.puns.count_documents(
-                {
-                    'timestamp': {'$gte': searchDate.timestamp(), '$lte': endDate.timestamp()},
-                    'type': {'$nin': ['unmute', 'unblacklist', 'note']},
-                }
-            )
+        # Messages are rolled up per UTC day, so every count covers whole days: windowStart until the start of the
+        # day after the last one included. Without a start date that is the last 30 days and today so far
+        windowStart = searchDate if start else searchDate - timedelta(days=30)
+        windowEnd = (endDate if start else searchDate).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
+            days=1
+        )
+        days = await mclient.bowser.activity.find(
+            {'_id': {'$gte': windowStart.strftime('%Y-%m-%d'), '$lt': windowEnd.strftime('%Y-%m-%d')}}
+        ).to_list()
+
+        msgCount = 0
+        channelCounts = collections.Counter()
+        userCounts = collections.Counter()
+        for day in days:
+            msgCount += day['messages']
+            channelCounts.update(day['channels'])
+            userCounts.update(day['authors'])
+
+        puns = await mclient.bowser.puns.count_documents(
+            {
+                'timestamp': {'$gte': windowStart.timestamp(), '$lt': windowEnd.timestamp()},
+                'type': {'$nin': ['unmute', 'unblacklist', 'note']},
+            }
+        )
 
-        topChannels = sorted(channelCounts.items(), key=lambda x: x[1], reverse=True)[
-            0:5
-        ]  # Get a list of tuple sorting by most active channel to least, and only include top 5
+        topChannels = channelCounts.most_common(5)  # Most active channel to least, only include top 5
         topChannelsList = []
         for x in topChannels:
-            channelObj = self.bot.get_channel(x[0])
+            channelObj = self.bot.get_channel(int(x[0]))
             if channelObj:
-                topChannelsList.append(f'{self.bot.get_channel(x[0]).mention} ({x[1]})')
+                topChannelsList.append(f'{channelObj.mention} ({x[1]})')
 
             else:
                 topChannelsList.append(f'*Deleted channel* ({x[1]})')
 
         await interaction.edit_original_response(content='One moment, crunching member data...')
-        netJoins = 0
-        netLeaves = 0
-        for member in mclient.bowser.users.find({'joins': {'$ne': []}}):
-            for join in member['joins']:
-                if not start and (searchDate.timestamp() - (60 * 60 * 24 * 30)) <= join <= endDate.timestamp():
-                    netJoins += 1
-
-                elif start and searchDate.timestamp() <= join <= endDate.timestamp():
-                    netJoins += 1
-
-            for leave in member['leaves']:
-                if not start and (searchDate.timestamp() - (60 * 60 * 24 * 30)) <= leave <= endDate.timestamp():
-                    netLeaves += 1
-
-                elif start and searchDate.timestamp() <= leave <= endDate.timestamp():
-                    netLeaves += 1
+        await self.memberFlow.refresh()
+        netJoins, netLeaves = self.memberFlow.count(windowStart.timestamp(), windowEnd.timestamp())
 
         activeChannels = ', '.join(topChannelsList)
         premiumTier = 'No tier' if interaction.guild.premium_tier == 0 else f'Tier {interaction.guild.premium_tier}'
@@ -179,27 +197,23 @@ class StatCommands(commands.Cog, name='Statistic Commands'):
     async def _stats_users(self, interaction: discord.Interaction):
         '''Returns most active users'''
         await interaction.response.send_message('One moment, crunching the numbers...')
-        messages = mclient.bowser.messages.find({'timestamp': {'$gt': (int(time.time()) - (60 * 60 * 24 * 30))}})
-        msgCounts = {}
-        for message in messages:
-            if message['author'] not in msgCounts.keys():
-                msgCounts[message['author']] = 1
-
-            else:
-                msgCounts[message['author']] += 1
-
-        topSenders = sorted(msgCounts.items(), key=lambda x: x[1], reverse=True)[
-            0:25
-        ]  # Get a list of tuple sorting by most message to least, and only include top 25
+        days = await mclient.bowser.activity.find(
+            {'_id': {'$gte': (datetime.now(tz=timezone.utc) - timedelta(days=30)).strftime('%Y-%m-%d')}}, {'authors': 1}
+        ).to_list()
+        msgCounts = collections.Counter()
+        for day in days:
+            msgCounts.update(day['authors'])
+
+        topSenders = msgCounts.most_common(25)  # Most messages to least, only include top 25
         embed = discord.Embed(
             title='Top User Statistics',
             description='List of the 25 highest message senders and their count during the last 30 days\n',
             color=0xD267BA,
         )
         for x in topSenders:
-            msgUser = interaction.guild.get_member(x[0])
+            msgUser = interaction.guild.get_member(int(x[0]))
             if not msgUser:
-                msgUser = await self.bot.fetch_user(x[0])
+                msgUser = await self.bot.fetch_user(int(x[0]))
 
             embed.add_field(name=str(msgUser), value=str(x[1]))
 
@@ -16,9 +16,10 @@ from discord import Webhook, WebhookType, app_commands
 from discord.ext import commands, tasks
 from rapidfuzz import process
 
+import database
 import tools
 
-mclient = pymongo.MongoClient(config.mongoURI)
+mclient = database.client()
 
 serverLogs = None
 modLogs = None
@@ -373,7 +374,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
     async def _info(self, interaction: discord.Interaction, user: discord.User):
         await interaction.response.defer(ephemeral=tools.mod_cmd_invoke_delete(interaction.channel))
         inServer = True
-        dbUser = mclient.bowser.users.find_one({'_id': user.id})
+        dbUser = await mclient.bowser.users.find_one({'_id': user.id})
         if interaction.guild.get_member(user.id):
             user = interaction.guild.get_member(user.id)
 
@@ -385,7 +386,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
             )
 
             # Case where a user could have an infraction even if they've never been recorded joining, i.e. ban
-            infractions = mclient.bowser.puns.count_documents({'user': user.id})
+            infractions = await mclient.bowser.puns.count_documents({'user': user.id})
             if infractions:
                 desc += f'\n\nUser has **{infractions}** infraction entr{"y" if infractions == 1 else "ies"}, use `/history {user.id}` to view.'
 
@@ -397,9 +398,8 @@ class ChatControl(commands.Cog, name='Utility Commands'):
             return await interaction.followup.send(embed=embed)
 
         # Member object, loads of info to work with
-        query = {'author': user.id}
-        messages = mclient.bowser.messages.find(query)
-        msgCount = mclient.bowser.messages.count_documents(query)
+        activity = await mclient.bowser.user_activity.find_one({'_id': user.id})
+        msgCount = 0 if not activity else activity['messages']
 
         desc = (
             f'Fetched user {user.mention}.'
@@ -457,20 +457,19 @@ class ChatControl(commands.Cog, name='Utility Commands'):
 
         embed.add_field(name='Roles', value=roles, inline=False)
 
-        lastMsg = (
-            'N/a' if msgCount == 0 else f'<t:{int(messages.sort("timestamp", pymongo.DESCENDING)[0]["timestamp"])}:f>'
-        )
+        lastMsg = 'N/a' if not activity else f'<t:{int(activity["last"])}:f>'
+
         embed.add_field(name='Last message', value=lastMsg, inline=True)
         embed.add_field(name='Created', value=f'<t:{int(user.created_at.timestamp())}:f>', inline=True)
 
         query = {'user': user.id, 'type': 'note'}
         fieldValue = 'View history to get full details on all notes\n\n'
-        noteCnt = mclient.bowser.puns.count_documents(query)
+        noteCnt = await mclient.bowser.puns.count_documents(query)
         if noteCnt:
             noteList = []
             noteDocs = mclient.bowser.puns.find(query)
 
-            for x in noteDocs.sort('timestamp', pymongo.DESCENDING):
+            async for x in noteDocs.sort('timestamp', pymongo.DESCENDING):
                 stamp = f'[<t:{int(x["timestamp"])}:d>]'
                 noteContent = f'{stamp}: {x["reason"]}'
 
@@ -488,7 +487,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
         punishments = ''
         query = {'user': user.id, 'type': {'$ne': 'note'}}
         punsCol = mclient.bowser.puns.find(query)
-        punsCnt = mclient.bowser.puns.count_documents(query)
+        punsCnt = await mclient.bowser.puns.count_documents(query)
         puns = 0
         if not punsCnt:
             punishments = '__*No punishments on record*__'
@@ -497,7 +496,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
             activeStrikes = 0
             totalStrikes = 0
             activeMute = None
-            for pun in punsCol.sort('timestamp', pymongo.DESCENDING):
+            async for pun in punsCol.sort('timestamp', pymongo.DESCENDING):
                 if pun['type'] == 'strike':
                     totalStrikes += pun['strike_count']
                     activeStrikes += pun['active_strike_count']
@@ -633,7 +632,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
             'note': 'User note',
         }
 
-        punsCnt = db.count_documents(query)
+        punsCnt = await db.count_documents(query)
         if punsCnt == 0:
             desc = deictic_language["no_punishments"][self_check]
         elif punsCnt == 1:
@@ -644,7 +643,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
         fields = []
         activeStrikes = 0
         totalStrikes = 0
-        for pun in puns.sort('timestamp', pymongo.DESCENDING):
+        async for pun in puns.sort('timestamp', pymongo.DESCENDING):
             datestamp = f'<t:{int(pun["timestamp"])}:f>'
             moderator = interaction.guild.get_member(pun['moderator'])
             if not moderator:
@@ -810,9 +809,11 @@ class ChatControl(commands.Cog, name='Utility Commands'):
     async def _tag_autocomplete(
         self, interaction: discord.Interaction, current: str
     ) -> typing.List[app_commands.Choice[str]]:
+        return await tools.autocompleter.run(interaction, 'tags', current, self._tag_choices)
+
+    async def _tag_choices(self, current: str) -> typing.List[app_commands.Choice[str]]:
         db = mclient.bowser.tags
-        tags = db.find({'active': True})
-        tagList = [tag['_id'] for tag in tags]
+        tagList = await db.distinct('_id', {'active': True})
         if current == '':
             return [app_commands.Choice(name=t, value=t) for t in tagList[0:10]]
 
@@ -832,7 +833,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
         db = mclient.bowser.tags
 
         query = query.lower()
-        tag = db.find_one({'_id': query, 'active': True})
+        tag = await db.find_one({'_id': query, 'active': True})
 
         if not tag:
             return await interaction.response.send_message(
@@ -856,7 +857,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
         db = mclient.bowser.tags
 
         tagList = []
-        for tag in db.find({'active': True}):
+        async for tag in db.find({'active': True}):
             description = '' if not 'desc' in tag else tag['desc']
             tagList.append({'name': tag['_id'].lower(), 'desc': description, 'content': tag['content']})
 
@@ -936,19 +937,19 @@ class ChatControl(commands.Cog, name='Utility Commands'):
             max_length=4000,
         )
 
-        def __init__(self, tag):
+        def __init__(self, tag, doc):
             super().__init__(title=f'Editing Tag: "{tag}"')
             self.tag = tag
             self.textbox.placeholder = 'Write some text! __Discord markdown is supported.__'
 
             self.db = mclient.bowser.tags
-            self.doc = self.db.find_one({'_id': self.tag})
+            self.doc = doc
             if self.doc:
                 self.textbox.default = self.doc['content']
 
         async def on_submit(self, interaction: discord.Interaction):
             if self.doc:
-                self.db.update_one(
+                await self.db.update_one(
                     {'_id': self.tag},
                     {
                         '$push': {
@@ -959,6 +960,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
                         '$set': {'content': self.textbox.value, 'active': True},
                     },
                 )
+                tools.autocompleter.invalidate('tags')
 
                 msg = (
                     f'{config.greenTick} The **{self.tag}** tag has been ' + 'updated'
@@ -968,7 +970,10 @@ class ChatControl(commands.Cog, name='Utility Commands'):
                 await interaction.response.send_message(msg)
 
             else:
-                self.db.insert_one({'_id': self.tag, 'content': self.textbox.value, 'revisions': [], 'active': True})
+                await self.db.insert_one(
+                    {'_id': self.tag, 'content': self.textbox.value, 'revisions': [], 'active': True}
+                )
+                tools.autocompleter.invalidate('tags')
                 return await interaction.response.send_message(
                     f'{config.greenTick} The **{self.tag}** tag has been created'
                 )
@@ -989,7 +994,8 @@ class ChatControl(commands.Cog, name='Utility Commands'):
         if name in ['list', 'search', 'edit', 'delete', 'source', 'setdesc', 'setimg']:  # Name blacklist
             return await interaction.response.send_message(f'{config.redTick} You cannot use that name for a tag')
 
-        modal = self.TagEdit(name.lower())
+        doc = await mclient.bowser.tags.find_one({'_id': name.lower()})
+        modal = self.TagEdit(name.lower(), doc)
         return await interaction.response.send_modal(modal)
 
     @manage_tag_group.command(name='delete', description='Delete an existing tag')
@@ -998,7 +1004,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
     async def _tag_delete(self, interaction: discord.Interaction, name: str):
         db = mclient.bowser.tags
         name = name.lower()
-        tag = db.find_one({'_id': name})
+        tag = await db.find_one({'_id': name})
         if tag:
             view = tools.RiskyConfirmation(timeout=20)
             await interaction.response.send_message(
@@ -1011,7 +1017,8 @@ class ChatControl(commands.Cog, name='Utility Commands'):
                 await view.message.edit(content='Deletion timed out. Rerun command to try again', view=view)
 
             if view.value:
-                db.update_one({'_id': name}, {'$set': {'active': False}})
+                await db.update_one({'_id': name}, {'$set': {'active': False}})
+                tools.autocompleter.invalidate('tags')
                 await view.message.edit(content=f'{config.greenTick} The "{name}" tag has been deleted')
 
             else:
@@ -1029,12 +1036,12 @@ class ChatControl(commands.Cog, name='Utility Commands'):
     async def _tag_setdesc(self, interaction: discord.Interaction, name: str, content: typing.Optional[str] = ''):
         db = mclient.bowser.tags
         name = name.lower()
-        tag = db.find_one({'_id': name})
+        tag = await db.find_one({'_id': name})
 
         content = ' '.join(content.splitlines())
 
         if tag:
-            db.update_one({'_id': tag['_id']}, {'$set': {'desc': content}})
+            await db.update_one({'_id': tag['_id']}, {'$set': {'desc': content}})
 
             status = 'updated' if content else 'cleared'
             return await interaction.response.send_message(
@@ -1060,7 +1067,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
     ):
         db = mclient.bowser.tags
         name = name.lower()
-        tag = db.find_one({'_id': name})
+        tag = await db.find_one({'_id': name})
 
         IMG_TYPES = {
             'main': {'key': 'img_main', 'name': 'main'},
@@ -1077,7 +1084,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
             return await interaction.response.send_message(f'{config.redTick} An invalid url, `{url}`, was given')
 
         if tag:
-            db.update_one({'_id': tag['_id']}, {'$set': {img_type['key']: url}})
+            await db.update_one({'_id': tag['_id']}, {'$set': {img_type['key']: url}})
 
             status = 'updated' if url else 'cleared'
             return await interaction.response.send_message(
@@ -1092,7 +1099,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
     async def _tag_source(self, interaction: discord.Interaction, name: str):
         db = mclient.bowser.tags
         name = name.lower()
-        tag = db.find_one({'_id': name})
+        tag = await db.find_one({'_id': name})
 
         if tag:
             embed = discord.Embed(title=f'{name} source', description=f'```md\n{tag["content"]}\n```')
@@ -1146,7 +1153,7 @@ class ChatControl(commands.Cog, name='Utility Commands'):
             )
 
         else:
-            db.find_one_and_update(
+            await db.find_one_and_update(
                 {'user': member.id, 'type': 'blacklist', 'active': True, 'context': context},
                 {'$set': {'active': False}},
             )
@@ -1194,14 +1201,14 @@ class ChatControl(commands.Cog, name='Utility Commands'):
         if feature == 'modmail':
             context = 'modmail'
             users = mclient.bowser.users
-            dbUser = users.find_one({'_id': member.id})
+            dbUser = await users.find_one({'_id': member.id})
 
             if dbUser['modmail']:
-                users.update_one({'_id': member.id}, {'$set': {'modmail': False}})
+                await users.update_one({'_id': member.id}, {'$set': {'modmail': False}})
                 statusText = 'Blacklisted'
 
             else:
-                users.update_one({'_id': member.id}, {'$set': {'modmail': True}})
+                await users.update_one({'_id': member.id}, {'$set': {'modmail': True}})
                 statusText = 'Unblacklisted'
 
         elif feature == 'reactions':
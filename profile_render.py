@@ -0,0 +1,788 @@
+'''
+Profile card rendering. This runs inside worker processes so that Pillow compositing and PNG encoding never block the
+bot's event loop. Each worker loads the static assets once in `init_worker`, after which the cog submits picklable
+render specs and receives PNG bytes back.
+'''
+
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import re
+import sys
+import typing
+
+import emoji_data
+import numpy as np
+import yaml
+from PIL import Image, ImageDraw, ImageFont
+
+import cache
+
+TWEMOJI_PATH = 'resources/twemoji/assets/72x72/'
+TWEMOJI_ATLAS_PATH = 'resources/cache/twemoji/'
+RENDER_VERSION = 3  # Bump when card output changes so cached cards are not reused
+BACKGROUND_CACHE_PATH = 'resources/cache/backgrounds/'
+BACKGROUND_CACHE_BYTES = 64 * 1024 * 1024  # ~11 flattened 1600x900 backgrounds per worker
+PFP_BOX = (50, 170, 300, 420)
+PFP_SIZE = (250, 250)
+PREVIEW_WIDTH = 1600
+
+# Output settings for each kind of image, overridden per key by config.profileEncoder. `alpha` False flattens onto
+# `matte`, JPEG always does. Remaining keys are passed to Image.save
+ENCODER_DEFAULTS = {
+    'card': {'format': 'PNG', 'compress_level': 3, 'alpha': True, 'matte': '#313338'},
+    'preview': {'format': 'PNG', 'compress_level': 3, 'alpha': True, 'matte': '#313338'},
+}
+FORMAT_EXTENSIONS = {'PNG': 'png', 'WEBP': 'webp', 'JPEG': 'jpg'}
+# Cards rendered without their clock are kept lossless until stamp_profile_time encodes them for real
+LAYER_ENCODER = {'format': 'PNG', 'compress_level': 1, 'alpha': True, 'matte': None}
+
+_renderer = None
+
+
+def encoder_settings(overrides: dict) -> dict:
+    '''ENCODER_DEFAULTS with overrides applied, falling back to PNG for formats this Pillow build can't write'''
+    Image.init()
+    settings = {}
+    for kind, defaults in ENCODER_DEFAULTS.items():
+        override = overrides.get(kind, {})
+        if override.get('format', defaults['format']).upper() != defaults['format']:
+            # Save options of the default format don't apply to another
+            settings[kind] = {'alpha': defaults['alpha'], 'matte': defaults['matte'], **override}
+
+        else:
+            settings[kind] = {**defaults, **override}
+
+        fmt = settings[kind]['format'] = settings[kind]['format'].upper()
+        if fmt not in FORMAT_EXTENSIONS or fmt not in Image.SAVE:
+            logging.warning(f'[Profiles] Unable to encode {kind} images as {fmt}, using PNG')
+            settings[kind] = defaults
+
+    return settings
+
+
+def encode_image(img: Image, settings: dict) -> bytes:
+    options = {k: v for k, v in settings.items() if k not in ['format', 'alpha', 'matte']}
+    if not settings['alpha'] or settings['format'] == 'JPEG':
+        flattened = Image.new('RGB', img.size, settings['matte'])
+        flattened.paste(img, mask=img.getchannel('A'))
+        img = flattened
+
+    bytesFile = io.BytesIO()
+    img.save(bytesFile, format=settings['format'], **options)
+    return bytesFile.getvalue()
+
+
+def _render_name_glyph(img: Image) -> Image:
+    return img.convert('RGBA').resize((40, 40))
+
+
+def _render_flag_glyph(img: Image) -> Image:
+    SHADOW_OFFSET = 2
+
+    regionImg = img.convert('RGBA')
+
+    # Drop Shadow
+    shadowData = np.array(regionImg)
+    shadowData[..., :-1] = (128, 128, 128)  # Set RGB but not alpha for all pixels
+    shadowImg = Image.fromarray(shadowData)
+
+    # Combine shadow
+    w, h = regionImg.size
+    img = Image.new('RGBA', (w + SHADOW_OFFSET, h + SHADOW_OFFSET), (0, 0, 0, 0))
+    img.paste(shadowImg, (SHADOW_OFFSET, SHADOW_OFFSET), shadowImg)
+    img.paste(regionImg, (0, 0), regionImg)
+
+    return img
+
+
+def _is_flag(name: str) -> bool:
+    '''Region indicator pairs, tag flags (england) and ZWJ flags (pirate, pride) by their leading code point'''
+    first = int(name.split('-')[0], 16)
+    return 0x1F1E6 <= first <= 0x1F1FF or first in [0x1F3F3, 0x1F3F4, 0x1F6A9, 0x1F38C]
+
+
+def build_twemoji_atlas(source: str = TWEMOJI_PATH, path: str = TWEMOJI_ATLAS_PATH):
+    '''
+    Pack the twemoji assets into arrays of ready to paste glyphs: every emoji at display name size, and flags with
+    their drop shadow. Written as .npy files with a json index of code point sequence to row, see TwemojiAtlas
+    '''
+    names = sorted(os.path.splitext(f)[0] for f in os.listdir(source) if f.endswith('.png'))
+    glyphs = []
+    flags = []
+    index = {'glyphs': {}, 'flags': {}}
+    for name in names:
+        with Image.open(os.path.join(source, name + '.png')) as img:
+            index['glyphs'][name] = len(glyphs)
+            glyphs.append(np.asarray(_render_name_glyph(img)))
+
+            if _is_flag(name):
+                flag = np.asarray(_render_flag_glyph(img))
+                if flags and flag.shape != flags[0].shape:
+                    continue  # Odd sized source, loaded from disk instead
+
+                index['flags'][name] = len(flags)
+                flags.append(flag)
+
+    os.makedirs(path, exist_ok=True)
+    for filename, data in [('glyphs.npy', glyphs), ('flags.npy', flags)]:
+        temp = os.path.join(path, filename + '.tmp')
+        with open(temp, 'wb') as f:
+            np.save(f, np.stack(data) if data else np.empty((0, 0, 0, 4), dtype=np.uint8))
+
+        os.replace(temp, os.path.join(path, filename))
+
+    # Index goes last, a partially built atlas is never picked up by workers
+    temp = os.path.join(path, 'index.json.tmp')
+    with open(temp, 'w') as f:
+        json.dump(index, f)
+
+    os.replace(temp, os.path.join(path, 'index.json'))
+    logging.info(f'[Profiles] Built twemoji atlas of {len(glyphs)} glyphs and {len(flags)} flags')
+
+
+class LazyFonts(dict):
+    '''Faces of one font size keyed like `paths`, each opened the first time it is looked up'''
+
+    def __init__(self, paths: dict, size: int):
+        super().__init__()
+        self.paths = paths
+        self.size = size
+
+    def __missing__(self, key):
+        font = self[key] = ImageFont.truetype(self.paths[key], self.size)
+        return font
+
+
+class TwemojiAtlas:
+    '''
+    Read side of build_twemoji_atlas. The arrays are memory-mapped so only glyphs that are drawn are paged in, and a
+    small LRU holds those as images. Falls back to the individual asset files when the atlas has not been built
+    '''
+
+    def __init__(self, path: str = TWEMOJI_ATLAS_PATH):
+        self.index = {'glyphs': {}, 'flags': {}}
+        self.arrays = {}
+        self.cache = cache.LRUCache(max_items=512)
+
+        try:
+            with open(os.path.join(path, 'index.json'), 'r') as f:
+                index = json.load(f)
+
+            self.arrays = {kind: np.load(os.path.join(path, f'{kind}.npy'), mmap_mode='r') for kind in self.index}
+            self.index = index
+
+        except (OSError, ValueError):
+            logging.warning('[Profiles] Twemoji atlas not built, emoji will be loaded from their asset files')
+
+    def _get(self, kind: str, name: str, render) -> Image:
+        key = (kind, name)
+        img = self.cache.get(key)
+        if img is None:
+            if name in self.index[kind]:
+                img = Image.fromarray(np.array(self.arrays[kind][self.index[kind][name]]))
+
+            else:
+                with Image.open(TWEMOJI_PATH + name + '.png') as source:
+                    img = render(source)
+
+            self.cache.put(key, img)
+
+        return img
+
+    def has_glyph(self, name: str) -> bool:
+        return name in self.index['glyphs'] or os.path.isfile(TWEMOJI_PATH + name + '.png')
+
+    def glyph(self, name: str) -> Image:
+        '''40px emoji for display names'''
+        return self._get('glyphs', name, _render_name_glyph)
+
+    def flag(self, name: str) -> Image:
+        '''Full size flag emoji with drop shadow'''
+        return self._get('flags', name, _render_flag_glyph)
+
+
+class ProfileRenderer:
+    def __init__(self, encoder: typing.Optional[dict] = None):
+        self.encoder = encoder or encoder_settings({})
+        self.profileFonts = self._load_fonts(
+            {
+                'meta': ('Regular', 36),
+                'user': ('Regular', 48),
+                'subtext': ('Light', 48),
+                'medium': ('Light', 36),
+                'small': ('Light', 30),
+            }
+        )
+
+        emoji_data.load_emoji_data()
+
+        # Longest sequences first, so ZWJ, flag and skin tone clusters match whole rather than as their parts
+        emoji = sorted((sequence for sequence, _ in emoji_data.EmojiSequence.items()), key=len, reverse=True)
+        self.emojiRegex = re.compile('|'.join(re.escape(sequence) for sequence in emoji))
+        self.nameSegmentCache = cache.LRUCache(max_items=1024)
+        self.titleLayoutCache = cache.LRUCache(max_items=4096)
+        self.gameIconCache = cache.LRUCache(max_items=512)  # Encoded icon: decoded image
+
+        with open("resources/profiles/themes.yml", 'r') as stream:
+            self.themes = yaml.safe_load(stream)
+
+        with open("resources/profiles/borders.yml", 'r') as stream:
+            self.borders = yaml.safe_load(stream)
+
+        with open("resources/profiles/backgrounds.yml", 'r') as stream:
+            self.backgrounds = yaml.safe_load(stream)
+
+        # Backgrounds are decoded and flattened on first use, see _background_image and _flatten_background
+        self.backgroundLayerCache = cache.LRUCache(
+            max_items=len(self.backgrounds),
+            max_bytes=BACKGROUND_CACHE_BYTES,
+            sizeof=lambda layers: layers['base'].width * layers['base'].height * 4,
+        )
+        os.makedirs(BACKGROUND_CACHE_PATH, exist_ok=True)
+        self.thumbnailCache = cache.LRUCache(
+            max_items=len(self.backgrounds) * 4, max_bytes=32 * 1024 * 1024, sizeof=lambda i: i.width * i.height * 4
+        )
+
+        for theme in self.themes.keys():
+            self.themes[theme]['pfpBackground'] = Image.open(
+                f'resources/profiles/layout/{theme}/pfp-background.png'
+            ).convert('RGBA')
+            self.themes[theme]['missingImage'] = (
+                Image.open(f'resources/profiles/layout/{theme}/missing-game.png').convert("RGBA").resize((120, 120))
+            )
+            self.themes[theme]['profileStatic'] = self._init_profile_static(theme)  # Do this last
+
+        self.trophyImgCache = {}
+        self.borderImgCache = {}
+        self.twemoji = TwemojiAtlas()
+
+    def _load_fonts(self, fonts_defs):
+        '''Load normal and CJK versions of given dict of fonts. CJK faces are large and rarely used, so load on first use'''
+        font_paths = {
+            None: 'resources/notosans/NotoSans-{0}.ttf',
+            'jp': 'resources/notosans/NotoSansCJKjp-{0}.otf',
+        }
+        fonts = {}
+
+        for name, (weight, size) in fonts_defs.items():
+            paths = {font: path.format(weight) for font, path in font_paths.items()}
+            for font_path in paths.values():
+                if not os.path.isfile(font_path):
+                    raise Exception('Font file not found: ' + font_path)
+
+            fonts[name] = LazyFonts(paths, size)
+            fonts[name][None] = ImageFont.truetype(paths[None], size)  # Always needed, so not deferred
+
+        return fonts
+
+    # https://medium.com/the-artificial-impostor/4ac839ba313a
+    def _determine_cjk_font(self, text):
+        '''Determine correct CJK font, if needed'''
+        if re.search(r"[\u3040-\u30ff\u4e00-\u9FFF]", text):
+            return 'jp'
+        return None
+
+    def _segment_name(self, name: str) -> list:
+        '''
+        Split a display name into (text, None) runs and (emoji, twemoji asset name) clusters. Emoji without a twemoji
+        asset are kept as text
+        '''
+        segments = self.nameSegmentCache.get(name)
+        if segments is not None:
+            return segments
+
+        segments = []
+        position = 0
+        for match in self.emojiRegex.finditer(name):
+            cluster = match.group()
+            # Twemoji names drop the variation selector, except in ZWJ sequences
+            keepVS = '\u200d' in cluster
+            glyph = '-'.join(f'{ord(c):x}' for c in cluster if keepVS or c != '\ufe0f')
+            if not self.twemoji.has_glyph(glyph):
+                continue
+
+            if match.start() > position:
+                segments.append((name[position : match.start()], None))
+
+            segments.append((cluster, glyph))
+            position = match.end()
+
+        if position < len(name):
+            segments.append((name[position:], None))
+
+        self.nameSegmentCache.put(name, segments)
+        return segments
+
+    def _draw_text(self, draw: ImageDraw, xy, text: str, fill, fonts: dict):
+        font = fonts[self._determine_cjk_font(text)]
+        return draw.text(xy, text, tuple(fill), font)
+
+    def _init_profile_static(self, theme_name: str) -> Image:
+        '''Inits static elements above background for profile card precache'''
+        theme = self.themes[theme_name]
+
+        fonts = self.profileFonts
+        img = Image.new('RGBA', theme['pfpBackground'].size, (0, 0, 0, 0))
+
+        snoo = Image.open('resources/profiles/layout/snoo.png').convert("RGBA")
+        gameUnderline = Image.open(f'resources/profiles/layout/{theme_name}/trophy-case-underline.png').convert("RGBA")
+        trophyUnderline = Image.open(f'resources/profiles/layout/{theme_name}/favorite-games-underline.png').convert(
+            "RGBA"
+        )
+
+        img.paste(snoo, (50, 50), snoo)
+        img.paste(trophyUnderline, (60, 610), trophyUnderline)
+        img.paste(gameUnderline, (1150, 95), gameUnderline)
+
+        draw = ImageDraw.Draw(img)
+        self._draw_text(draw, (150, 51), '/r/NintendoSwitch Discord', theme['branding'], fonts['meta'])
+        self._draw_text(draw, (150, 91), 'User Profile', theme['secondary_heading'], fonts['meta'])
+        self._draw_text(draw, (60, 460), 'Member since', theme['secondary_heading'], fonts['small'])
+        self._draw_text(draw, (435, 460), 'Messages sent', theme['secondary_heading'], fonts['small'])
+        self._draw_text(draw, (790, 460), 'Local time', theme['secondary_heading'], fonts['small'])
+        self._draw_text(draw, (1150, 42), 'Favorite games', theme['primary_heading'], fonts['medium'])
+        self._draw_text(draw, (60, 557), 'Trophy case', theme['primary_heading'], fonts['medium'])
+
+        return img
+
+    def _render_background_image_from_slug(self, name: str) -> Image:
+        bg = self.backgrounds[name]
+        img = Image.open(f'resources/profiles/backgrounds/{name}.png').convert("RGBA")
+        return self._render_background_image(img, bg['theme'], bg['trophy-bg-opacity'])
+
+    def _background_image(self, name: str) -> Image:
+        '''
+        Composited background for a slug. The result is persisted as a raw RGBA .npy file and memory-mapped on later
+        loads, so there is no PNG decode after the first render and pages of idle backgrounds can be dropped by the OS
+        '''
+        bg = self.backgrounds[name]
+        source = f'resources/profiles/backgrounds/{name}.png'
+        tbgSource = f'resources/profiles/layout/{bg["theme"]}/trophy-bg/{bg["trophy-bg-opacity"]}.png'
+        stamp = [name, bg['theme'], str(bg['trophy-bg-opacity'])]
+        for asset in (source, tbgSource):
+            if os.path.isfile(asset):
+                stat = os.stat(asset)
+                stamp += [stat.st_size, stat.st_mtime_ns]
+
+        digest = hashlib.sha1(repr(stamp).encode()).hexdigest()[:16]
+        path = os.path.join(BACKGROUND_CACHE_PATH, f'{name}-{digest}.npy')
+
+        try:
+            data = np.load(path, mmap_mode='r')
+
+        except (OSError, ValueError):
+            data = np.asarray(self._render_background_image_from_slug(name))
+            temp = f'{path}.{os.getpid()}.tmp'
+            try:
+                with open(temp, 'wb') as f:
+                    np.save(f, data)
+
+                os.replace(temp, path)  # Other workers may be writing the same file
+                for stale in glob.glob(os.path.join(BACKGROUND_CACHE_PATH, f'{name}-{"?" * 16}.npy')):
+                    if stale != path:
+                        with contextlib.suppress(FileNotFoundError):
+                            os.remove(stale)
+
+            except OSError as e:
+                logging.error(f'[Profiles] Unable to persist background {name}: {e}')
+
+        height, width = data.shape[:2]
+        return Image.frombuffer('RGBA', (width, height), data, 'raw', 'RGBA', 0, 1)
+
+    def _render_background_image(self, img, theme, trophy_bg_opacity):
+        tbg_opacity = str(trophy_bg_opacity)
+
+        ## Check theme ##
+        valid_themes = next(os.walk('resources/profiles/layout/'))[1]
+
+        if theme not in valid_themes:
+            raise ValueError(f'Invalid theme {theme}, must be one of: {", ".join(valid_themes)}')
+
+        ## Check opacity ##
+        tcp = f'resources/profiles/layout/{theme}/trophy-bg/'
+        valid_opac = [os.path.splitext(u)[0] for u in [t.split('/')[-1] for t in glob.glob(os.path.join(tcp, '*.png'))]]
+
+        if tbg_opacity not in valid_opac:
+            v = ", ".join(valid_opac)
+            raise ValueError(f'Invalid trophy background opacity {tbg_opacity} for theme {theme}, must be one of: {v}')
+
+        ## Render ##
+        trophy_bg_path = f'resources/profiles/layout/{theme}/trophy-bg/{tbg_opacity}.png'
+        trophy_bg = Image.open(trophy_bg_path).convert("RGBA")
+
+        final = Image.alpha_composite(img, trophy_bg.resize(img.size))
+        return final
+
+    def _cache_trophy_image(self, name: str, theme_name: str) -> Image:
+        if name is None:
+            name = f'none-{theme_name}'
+            path = f'resources/profiles/layout/{theme_name}/trophy-blank.png'
+        else:
+            path = 'resources/profiles/trophies/{}.png'.format(name)
+
+        if not name in self.trophyImgCache:
+            self.trophyImgCache[name] = Image.open(path).convert("RGBA")
+
+        return self.trophyImgCache[name]
+
+    def _cache_border_image(self, name: str) -> Image:
+        if not name in self.borderImgCache:
+            self.borderImgCache[name] = Image.open('resources/profiles/borders/{}.png'.format(name)).convert("RGBA")
+
+        return self.borderImgCache[name]
+
+    def _flatten_background(self, image: Image, theme_name: str) -> dict:
+        '''
+        Layers that are identical on every card with this background: the theme base, background and static labels
+        flattened into one image. The avatar sits beneath the background and labels, so the layers covering its box are
+        also kept as crops to redraw just that region per card
+        '''
+        theme = self.themes[theme_name]
+
+        base = theme['pfpBackground'].copy()
+        base.paste(image, mask=image)
+        base.paste(theme['profileStatic'], mask=theme['profileStatic'])
+
+        return {
+            'base': base,
+            'theme': theme_name,
+            'pfpLayers': [layer.crop(PFP_BOX) for layer in (theme['pfpBackground'], image, theme['profileStatic'])],
+        }
+
+    def _resolve_background(self, background) -> dict:
+        '''Backgrounds are either a slug from backgrounds.yml, or a dict with raw PNG `image` bytes to validate'''
+        if isinstance(background, str):
+            layers = self.backgroundLayerCache.get(background)
+            if layers is None:
+                layers = self._flatten_background(
+                    self._background_image(background), self.backgrounds[background]['theme']
+                )
+                self.backgroundLayerCache.put(background, layers)
+
+            return layers
+
+        img = Image.open(io.BytesIO(background['image'])).convert("RGBA")
+        img = self._render_background_image(img, background['theme'], background['trophy-bg-opacity'])
+        return self._flatten_background(img, background['theme'])
+
+    def _background_thumbnail(self, name: str, size: tuple) -> Image:
+        '''Preview tile for a background, labelled with its slug and scaled down once per tile size'''
+        key = (name, size)
+        thumbnail = self.thumbnailCache.get(key)
+        if thumbnail is None:
+            background = self._resolve_background(name)
+            theme = self.themes[background["theme"]]
+
+            image = background['base'].copy()
+            draw = ImageDraw.Draw(image)
+            self._draw_text(draw, (350, 215), name, theme["primary"], self.profileFonts['user'])
+
+            thumbnail = image.resize(size)
+            self.thumbnailCache.put(key, thumbnail)
+
+        return thumbnail
+
+    def render_background_preview(self, backgrounds: list) -> bytes:
+        # square_length: Gets smallest square dimensions that will fit length of backgrounds, ie len 17 -> 25
+        square_length = math.ceil(math.sqrt(len(backgrounds)))
+
+        # rows_required is used to chop the bottom off, i.e. 2 bgs have a 2x2 w/ square_length but we only need 2x1
+        rows_required = math.ceil(len(backgrounds) / square_length)
+
+        # Tiles are assembled at the final size, rather than shrinking a grid of full size cards
+        tileW = PREVIEW_WIDTH / square_length
+        tileH = tileW * 9 / 16
+        tileSize = (math.ceil(tileW), math.ceil(tileH))
+        canvas = Image.new('RGBA', (PREVIEW_WIDTH, round(rows_required * tileH)), (0, 0, 0, 0))
+
+        for i, name in enumerate(backgrounds):
+            thumbnail = self._background_thumbnail(name, tileSize)
+            paste_at = (round(i % square_length * tileW), round(i // square_length * tileH))
+            canvas.paste(thumbnail, paste_at, thumbnail)
+
+        return encode_image(canvas, self.encoder['preview'])
+
+    def _wrap_game_title(self, gameName: str) -> list:
+        '''Lines of a favorite game's title, at most 3. Layouts are cached as a title is measured the same on every card'''
+        lines = self.titleLayoutCache.get(gameName)
+        if lines is not None:
+            return lines
+
+        nameW = 1285
+        nameWMax = 1525
+
+        game_name_font = self.profileFonts['medium'][self._determine_cjk_font(gameName)]
+
+        # Word wrap logic with overflow protection
+        words = gameName.split()
+        lines = []
+        current_line = []
+        current_w = 0
+
+        # Use nameW as the starting X coordinate for all lines
+        start_x = nameW
+        max_w = nameWMax - start_x
+        space_w = game_name_font.getsize(' ')[0]
+
+        for word in words:
+            word_w = game_name_font.getsize(word)[0]
+
+            # Handle massive words that don't fit on a single line
+            if word_w > max_w:
+                if current_line:
+                    lines.append(' '.join(current_line))
+                    current_line = []
+                    current_w = 0
+
+                # Split the long word by character
+                partial_word = ""
+                partial_w = 0
+                for char in word:
+                    char_w = game_name_font.getsize(char)[0]
+                    if partial_w + char_w > max_w:
+                        lines.append(partial_word)
+                        partial_word = char
+                        partial_w = char_w
+                    else:
+                        partial_word += char
+                        partial_w += char_w
+
+                if partial_word:
+                    current_line = [partial_word]
+                    current_w = partial_w + space_w
+
+            # Handle normal words
+            elif current_w + word_w <= max_w:
+                current_line.append(word)
+                current_w += word_w + space_w
+            else:
+                if current_line:
+                    lines.append(' '.join(current_line))
+                current_line = [word]
+                current_w = word_w + space_w
+
+        if current_line:
+            lines.append(' '.join(current_line))
+
+        # Safety: Limit to 3 lines and trim for ellipsis
+        if len(lines) > 3:
+            lines = lines[:3]
+            ellipsis = "..."
+            ellipsis_w = game_name_font.getsize(ellipsis)[0]
+
+            # Shrink the last line until "..." fits
+            while lines[-1]:
+                current_line_w = game_name_font.getsize(lines[-1])[0]
+                if current_line_w + ellipsis_w <= max_w:
+                    break
+                lines[-1] = lines[-1][:-1]  # Remove last char
+
+            lines[-1] += ellipsis
+
+        # Safety: Limit to 3 lines
+        if len(lines) > 3:
+            lines = lines[:3]
+            lines[-1] += "..."
+
+        self.titleLayoutCache.put(gameName, lines)
+        return lines
+
+    def _game_icon(self, data: bytes) -> Image:
+        '''Decode a game icon, which resize_game_icon has normally already sized for the card'''
+        icon = self.gameIconCache.get(data)
+        if icon is None:
+            icon = Image.open(io.BytesIO(data))
+            if icon.mode != 'RGBA':
+                icon = icon.convert('RGBA')
+
+            if icon.size != (120, 120):
+                icon = icon.resize((120, 120))
+
+            icon.load()
+            self.gameIconCache.put(data, icon)
+
+        return icon
+
+    def render_profile_card(self, profile: dict) -> bytes:
+        background = self._resolve_background(profile['background'])
+        theme = self.themes[background["theme"]]
+
+        # Avatars arrive pre-sized from resize_avatar
+        pfp = (
+            Image.frombytes('RGBA', PFP_SIZE, profile['pfp'])
+            if profile['pfp']
+            else Image.new('RGBA', PFP_SIZE, 'black')
+        )
+
+        # Redraw only the avatar box, with the same layer order as the flattened base
+        pfpBase, pfpBackground, pfpStatic = background['pfpLayers']
+        pfpRegion = pfpBase.copy()
+        pfpRegion.paste(pfp, (0, 0), pfp)
+        pfpRegion.paste(pfpBackground, mask=pfpBackground)
+        pfpRegion.paste(pfpStatic, mask=pfpStatic)
+
+        card = background['base'].copy()
+        card.paste(pfpRegion, PFP_BOX[:2])
+
+        draw = ImageDraw.Draw(card)
+        fonts = self.profileFonts
+
+        # userinfo
+        nameW = 350
+
+        # Member name may be rendered in parts, so we want to ensure the font stays the same for the entire thing
+        member_name_font = fonts['user'][self._determine_cjk_font(profile['display_name'])]
+
+        for text, glyph in self._segment_name(profile['display_name']):
+            if glyph is None:
+                draw.text((nameW, 215), text, tuple(theme["primary"]), member_name_font)
+                nameW += draw.textsize(text, font=member_name_font)[0]
+
+            else:
+                emojiPic = self.twemoji.glyph(glyph)
+                card.paste(emojiPic, (nameW + 3, 228), emojiPic)
+                nameW += 46
+
+        self._draw_text(draw, (350, 275), profile['username'], theme["secondary"], fonts['subtext'])
+
+        if profile['regionFlag']:
+            regionImg = self.twemoji.flag(profile['regionFlag'])
+            card.paste(regionImg, (976, 50), regionImg)
+
+        # Friend code
+        if profile['friendcode']:
+            self._draw_text(draw, (350, 330), profile['friendcode'], theme["friend_code"], fonts['subtext'])
+
+        self._draw_text(draw, (435, 490), profile['message_count'], theme["primary"], fonts['medium'])
+        self._draw_text(draw, (60, 490), profile['joindate'], theme["primary"], fonts['medium'])
+        if profile['usertime'] is not None:  # Otherwise drawn by stamp_profile_time
+            self._draw_text(draw, (790, 490), profile['usertime'], theme["primary"], fonts['medium'])
+
+        # Start trophies
+        trophyLocations = {
+            0: (60, 630),
+            1: (171, 630),
+            2: (283, 630),
+            3: (394, 630),
+            4: (505, 630),
+            5: (616, 630),
+            6: (728, 630),
+            7: (839, 630),
+            8: (950, 630),
+            9: (60, 745),
+            10: (171, 745),
+            11: (283, 745),
+            12: (394, 745),
+            13: (505, 745),
+            14: (616, 745),
+            15: (728, 745),
+            16: (839, 745),
+            17: (950, 745),
+        }
+        trophyNum = 0
+        useBorder = None
+        for x in profile['trophies']:
+            if useBorder is None and x in self.borders['trophy_borders']:
+                useBorder = self.borders['trophy_borders'][x]
+
+            trophyBadge = self._cache_trophy_image(x, background["theme"])
+            card.paste(trophyBadge, trophyLocations[trophyNum], trophyBadge)
+            trophyNum += 1
+
+        # border!
+        useBorder = useBorder or self.borders['default']
+        border = self._cache_border_image(useBorder)
+        card.paste(border, (0, 0), border)
+
+        # Start favorite games, already resolved to (name, icon bytes or None) by the cog
+        gameIconLocations = {0: (1150, 130), 1: (1150, 280), 2: (1150, 430), 3: (1150, 580), 4: (1150, 730)}
+        gameTextLocations = {0: 130, 1: 280, 2: 430, 3: 580, 4: 730}
+
+        gameCount = 0
+        for gameName, gameImg in profile['games'][:5]:
+            gameIcon = theme['missingImage']
+            if gameImg:
+                try:
+                    gameIcon = self._game_icon(gameImg)
+
+                except Exception as e:
+                    logging.error('Error decoding game icon', exc_info=e)
+
+            card.paste(gameIcon, gameIconLocations[gameCount], gameIcon)
+
+            game_name_font = fonts['medium'][self._determine_cjk_font(gameName)]
+            start_x = 1285
+            lines = self._wrap_game_title(gameName)
+
+            # Draw the wrapped lines
+            # Use gameTextLocations[gameCount] as the starting Y
+            y_pos = gameTextLocations[gameCount]
+
+            for line in lines:
+                # Draw text at the stored start_x
+                draw.text((start_x, y_pos), line, tuple(theme["primary"]), font=game_name_font)
+                y_pos += 40  # Increase height by 40px for next line
+
+            gameCount += 1
+        if gameCount == 0:  # No games rendered
+            self._draw_text(draw, (1150, 130), 'Not specified', theme["secondary_heading"], fonts['medium'])
+
+        return encode_image(card, self.encoder['card'] if profile['usertime'] is not None else LAYER_ENCODER)
+
+    def stamp_profile_time(self, layer: bytes, background: str, usertime: str) -> bytes:
+        '''Draw the local time onto a card rendered without one, so the rest of the card can be cached across minutes'''
+        card = Image.open(io.BytesIO(layer)).convert('RGBA')
+        theme = self.themes[self.backgrounds[background]['theme']]
+        self._draw_text(ImageDraw.Draw(card), (790, 490), usertime, theme["primary"], self.profileFonts['medium'])
+        return encode_image(card, self.encoder['card'])
+
+
+def init_worker(encoder: typing.Optional[dict] = None):
+    '''Process pool initializer, loads every static asset once per worker'''
+    global _renderer
+    database = sys.modules.get('database')
+    if database and database._clients:  # Workers only render, they must not hold a connection pool of their own
+        logging.error(f'[Profiles] Render worker {os.getpid()} opened MongoDB clients: {", ".join(database._clients)}')
+
+    _renderer = ProfileRenderer(encoder)
+
+
+def ping() -> bool:
+    '''No-op used to start workers ahead of the first render'''
+    return True
+
+
+def render_profile_card(profile: dict) -> bytes:
+    return _renderer.render_profile_card(profile)
+
+
+def stamp_profile_time(layer: bytes, background: str, usertime: str) -> bytes:
+    return _renderer.stamp_profile_time(layer, background, usertime)
+
+
+def render_background_preview(backgrounds: list) -> bytes:
+    return _renderer.render_background_preview(backgrounds)
+
+
+def resize_avatar(data: bytes) -> bytes:
+    '''Raw RGBA pixels of an avatar at the size drawn on cards'''
+    return Image.open(io.BytesIO(data)).convert('RGBA').resize(PFP_SIZE).tobytes()
+
+
+def resize_game_icon(data: bytes) -> bytes:
+    '''Downloaded game art scaled to the size drawn on cards, raises if it is not an image'''
+    icon = Image.open(io.BytesIO(data)).convert('RGBA').resize((120, 120))
+    bytesFile = io.BytesIO()
+    icon.save(bytesFile, format='PNG')
+    return bytesFile.getvalue()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    build_twemoji_atlas()
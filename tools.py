@@ -1,4 +1,5 @@
 import asyncio
+import collections
 import logging
 import os
 import re
@@ -12,7 +13,12 @@ import config
 import discord
 import pymongo
 
-mclient = pymongo.MongoClient(config.mongoURI)
+import cache
+import database
+
+mclient = database.client()
+
+USER_ACTIVITY_REBUILD_MS = 2 * 60 * 60 * 1000  # Server side time limit for rebuild_user_activity
 
 linkRe = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[#-_]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', re.I)
 reasonFilterLinkRe = re.compile(
@@ -103,7 +109,7 @@ async def message_archive(archive: typing.Union[discord.Message, list], edit=Non
 
     archiveID = f'{archive[0].id}-{int(time.time() * 1000)}'
     if edit:
-        db.insert_one(
+        await db.insert_one(
             {
                 '_id': archiveID,
                 'key': archiveID,
@@ -182,7 +188,7 @@ async def message_archive(archive: typing.Union[discord.Message, list], edit=Non
                 }
             )
 
-        db.insert_one(
+        await db.insert_one(
             {
                 '_id': archiveID,
                 'key': archiveID,
@@ -217,7 +223,7 @@ async def message_archive(archive: typing.Union[discord.Message, list], edit=Non
 async def store_user(member, messages=0):
     db = mclient.bowser.users
     # Double check exists
-    if db.find_one({'_id': member.id}):
+    if await db.find_one({'_id': member.id}):
         logging.error('Attempted to store user that already exists!')
         return
 
@@ -254,7 +260,111 @@ async def store_user(member, messages=0):
         'background': 'default-light',
         'backgrounds': ['default-light', 'default-dark'],
     }
-    db.insert_one(userData)
+    await db.insert_one(userData)
+
+
+def activity_day(timestamp: float) -> str:
+    '''The UTC day used as the _id of bowser.activity rollups, i.e. 2024-01-31'''
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+async def rollup_messages(documents: list):
+    '''Message writer hook that adds newly stored messages to the per-day channel and author counts'''
+    days = {}
+    for doc in documents:
+        inc = days.setdefault(activity_day(doc['timestamp']), {'messages': 0})
+        inc['messages'] += 1
+        for key in [f'channels.{doc["channel"]}', f'authors.{doc["author"]}']:
+            inc[key] = inc.get(key, 0) + 1
+
+    for day, inc in days.items():
+        await mclient.bowser.activity.update_one({'_id': day}, {'$inc': inc}, upsert=True)
+
+
+async def rebuild_activity_rollup(day: str):
+    '''Recount a single day of bowser.activity from bowser.messages, replacing any existing rollup'''
+    start = datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp()
+    result = await mclient.bowser.messages.aggregate(
+        [
+            {'$match': {'timestamp': {'$gte': start, '$lt': start + 86400}}},
+            {
+                '$facet': {
+                    'channels': [{'$group': {'_id': '$channel', 'count': {'$sum': 1}}}],
+                    'authors': [{'$group': {'_id': '$author', 'count': {'$sum': 1}}}],
+                }
+            },
+        ]
+    )
+    channels = {str(x['_id']): x['count'] for x in result[0]['channels']}
+    authors = {str(x['_id']): x['count'] for x in result[0]['authors']}
+    await mclient.bowser.activity.replace_one(
+        {'_id': day},
+        {'_id': day, 'messages': sum(channels.values()), 'channels': channels, 'authors': authors},
+        upsert=True,
+    )
+
+
+async def record_user_activity(documents: list):
+    '''Message writer hook that keeps the per-user totals and first/last message in bowser.user_activity current'''
+    authors = {}
+    for doc in documents:
+        summary = authors.setdefault(
+            doc['author'], {'messages': 0, 'first': doc['timestamp'], 'last': doc['timestamp'], 'channel': None}
+        )
+        summary['messages'] += 1
+        summary['first'] = min(summary['first'], doc['timestamp'])
+        if doc['timestamp'] >= summary['last']:
+            summary['last'] = doc['timestamp']
+            summary['channel'] = doc['channel']
+
+    operations = []
+    for author, summary in authors.items():
+        operations.append(
+            pymongo.UpdateOne(
+                {'_id': author},
+                {
+                    '$inc': {'messages': summary['messages']},
+                    '$min': {'first': summary['first']},
+                    '$max': {'last': summary['last']},
+                },
+                upsert=True,
+            )
+        )
+        # Only moves last_channel if this batch holds the newest message, backfilled history never overwrites it
+        operations.append(
+            pymongo.UpdateOne({'_id': author, 'last': summary['last']}, {'$set': {'last_channel': summary['channel']}})
+        )
+
+    if operations:
+        await mclient.bowser.user_activity.bulk_write(operations)
+
+
+async def rebuild_user_activity():
+    '''Recalculate bowser.user_activity for every author from bowser.messages. Requires MongoDB 4.2 for $merge'''
+    # Scans the whole message cache, so it runs on the maintenance client which has no socket timeout
+    await database.client('maintenance').bowser.messages.aggregate(
+        [
+            {
+                '$group': {
+                    '_id': '$author',
+                    'messages': {'$sum': 1},
+                    'first': {'$min': '$timestamp'},
+                    'newest': {'$max': {'timestamp': '$timestamp', 'channel': '$channel'}},
+                }
+            },
+            {
+                '$project': {
+                    'messages': 1,
+                    'first': 1,
+                    'last': '$newest.timestamp',
+                    'last_channel': '$newest.channel',
+                }
+            },
+            {'$merge': {'into': 'user_activity', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+        ],
+        allowDiskUse=True,
+        maxTimeMS=USER_ACTIVITY_REBUILD_MS,
+    )
 
 
 async def issue_pun(
@@ -273,10 +383,10 @@ async def issue_pun(
     db = mclient.bowser.puns
     timestamp = time.time() if not _date else _date
     docID = str(uuid.uuid4())
-    while db.find_one({'_id': docID}):  # Uh oh, duplicate uuid generated
+    while await db.find_one({'_id': docID}):  # Uh oh, duplicate uuid generated
         docID = str(uuid.uuid4())
 
-    db.insert_one(
+    await db.insert_one(
         {
             '_id': docID,
             'user': user,
@@ -391,7 +501,7 @@ async def commit_profile_change(bot, user: discord.User, element: str, item: str
     '''Given a user, update the owned status of a particular element (trophy, background, etc.), "item"'''
     # Calling functions should be verifying availability of item
     db = mclient.bowser.users
-    dbUser = db.find_one({'_id': user.id})
+    dbUser = await db.find_one({'_id': user.id})
     key = {'background': 'backgrounds', 'trophy': 'trophies'}[element]
 
     if item in dbUser[key] and not revoke:
@@ -403,28 +513,36 @@ async def commit_profile_change(bot, user: discord.User, element: str, item: str
     socialCog = bot.get_cog('Social Commands')
 
     if not revoke:
-        db.update({'_id': user.id}, {'$push': {key: item}})
+        await db.update_one({'_id': user.id}, {'$push': {key: item}})
+        if socialCog:  # Nothing is cached while the social module is unloaded
+            socialCog.invalidate_profile_card(user.id)
         dmMsg = f'Hey there {discord.utils.escape_markdown(user.name)}!\nYou have received a new item for your profile on the r/NintendoSwitch Discord server!\n\nThe **{item.replace("-", " ")}** {element} is now yours, enjoy! '
-        if element == 'background':
-            dmMsg += f'If you wish to use this background, use the `/profile background` command in our Discord server. Here\'s what your profile could look like:'
-            generated_background = socialCog._generate_background_preview([item])
-
-        else:
-            dmMsg += "Here's what your profile looks like with it:"
-            generated_background = await socialCog._generate_profile_card_from_member(user)
-
         try:
-            if not silent:
+            if not silent:  # Previews are only rendered when they will be sent, and queue behind interactive renders
+                if element == 'background':
+                    dmMsg += f'If you wish to use this background, use the `/profile background` command in our Discord server. Here\'s what your profile could look like:'
+                    generated_background = await socialCog._generate_background_preview(
+                        [item], requester=user.id, priority=socialCog.renderScheduler.BULK
+                    )
+
+                else:
+                    dmMsg += "Here's what your profile looks like with it:"
+                    generated_background = await socialCog._generate_profile_card_from_member(
+                        user, priority=socialCog.renderScheduler.BULK
+                    )
+
                 await user.send(dmMsg, file=generated_background)
 
         except (discord.NotFound, discord.Forbidden):
             pass
 
     else:
-        db.update({'_id': user.id}, {'$pull': {key: item}})
+        await db.update_one({'_id': user.id}, {'$pull': {key: item}})
+        if socialCog:  # Nothing is cached while the social module is unloaded
+            socialCog.invalidate_profile_card(user.id)
         # Reset background to default if the one being revoked is currently equiped
         if dbUser['background'] == item and element == 'background':
-            db.update({'_id': user.id}, {'$set': {'background': 'default-light'}})
+            await db.update_one({'_id': user.id}, {'$set': {'background': 'default-light'}})
 
         dmMsg = f'Hey there {discord.utils.escape_markdown(user.name)},\nA profile item has been revoked from you on the r/NintendoSwitch Discord server.\n\nThe **{item.replace("-", " ")}** {element} was revoked from you. '
         if element == 'background':
@@ -522,7 +640,7 @@ async def send_modlog(
 
 async def send_public_modlog(bot, id, channel, mock_document=None):
     db = mclient.bowser.puns
-    doc = mock_document if not id else db.find_one({'_id': id})
+    doc = mock_document if not id else await db.find_one({'_id': id})
 
     if not doc:
         return
@@ -579,7 +697,7 @@ async def send_public_modlog(bot, id, channel, mock_document=None):
     message = await channel.send(content, embed=embed)
 
     if id:
-        db.update_one({'_id': id}, {'$set': {'public_log_message': message.id, 'public_log_channel': channel.id}})
+        await db.update_one({'_id': id}, {'$set': {'public_log_message': message.id, 'public_log_channel': channel.id}})
 
 
 def filter_links_from_reason(reason):
@@ -723,6 +841,118 @@ def re_match_nonlink(pattern: typing.Pattern, string: str) -> typing.Optional[bo
     return any(not overlap for overlap in overlaps)
 
 
+class Autocompleter:
+    '''
+    Shared front end for slash command autocomplete callbacks. Discord sends a request on nearly every keystroke but
+    only shows the response to the newest one. Each request waits `DEBOUNCE` seconds first; one that a newer one from
+    the same user and option has superseded by then, or that is past Discord's deadline, is answered empty instead
+    of being computed. Results
+    are cached per callback and input for `ttl` seconds, and concurrent requests for the same input share one call.
+    '''
+
+    DEADLINE = 3.0  # Seconds Discord waits for an autocomplete response
+    DEBOUNCE = 0.12  # Seconds to wait for a following keystroke before computing
+
+    def __init__(self, ttl: float = 30.0, max_items: int = 1024):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.latest = {}  # (user, callback, option): newest interaction id
+        self.results = {}  # callback: LRUCache of input -> (expires, choices)
+        self.inflight = {}  # (callback, input, generation): task computing the choices
+        self.generations = collections.Counter()  # callback: times invalidated
+        self.stats = {'requests': 0, 'answered': 0, 'cached': 0, 'superseded': 0, 'late': 0}
+
+    @staticmethod
+    def _focused_option(options: list) -> typing.Optional[str]:
+        for option in options:
+            if option.get('focused'):
+                return option['name']
+
+            if 'options' in option:  # Subcommand or subcommand group
+                focused = Autocompleter._focused_option(option['options'])
+                if focused:
+                    return focused
+
+        return None
+
+    def _cached(self, name: str, current: str) -> typing.Optional[list]:
+        if name not in self.results:
+            return None
+
+        entry = self.results[name].get(current)
+        if not entry or entry[0] < time.monotonic():
+            return None
+
+        return entry[1]
+
+    def _finish(self, interaction: discord.Interaction, choices: list) -> list:
+        age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        self.stats['answered' if age < self.DEADLINE else 'late'] += 1
+        return choices
+
+    def invalidate(self, name: str, current: typing.Optional[str] = None):
+        '''Drop cached results for a callback, or for one of its inputs, i.e. after the data it searches has changed'''
+        if current is None:
+            self.results.pop(name, None)
+
+        elif name in self.results:
+            self.results[name].pop(current)
+
+        self.generations[name] += 1  # Results already being computed are not cached or shared any further
+
+    async def _compute(self, key: tuple, func: typing.Callable[[str], typing.Awaitable[list]]) -> list:
+        name, current, generation = key
+        try:
+            choices = await func(current)
+            if self.generations[name] == generation:
+                results = self.results.setdefault(name, cache.LRUCache(self.max_items))
+                results.put(current, (time.monotonic() + self.ttl, choices))
+
+            return choices
+
+        finally:
+            del self.inflight[key]
+
+    async def run(
+        self,
+        interaction: discord.Interaction,
+        name: str,
+        current: str,
+        func: typing.Callable[[str], typing.Awaitable[list]],
+    ) -> list:
+        self.stats['requests'] += 1
+        key = (interaction.user.id, name, self._focused_option(interaction.data.get('options', [])))
+        self.latest[key] = interaction.id
+        try:
+            choices = self._cached(name, current)
+            if choices is not None:
+                self.stats['cached'] += 1
+                return self._finish(interaction, choices)
+
+            await asyncio.sleep(self.DEBOUNCE)  # Let the following keystroke, if any, supersede this one
+            if self.latest.get(key) != interaction.id:
+                self.stats['superseded'] += 1
+                return []
+
+            if (discord.utils.utcnow() - interaction.created_at).total_seconds() >= self.DEADLINE:
+                self.stats['late'] += 1
+                return []
+
+            computeKey = (name, current, self.generations[name])
+            if computeKey not in self.inflight:
+                self.inflight[computeKey] = asyncio.ensure_future(self._compute(computeKey, func))
+
+            # Shielded so that one request being cancelled doesn't cancel the call for others sharing it
+            return self._finish(interaction, await asyncio.shield(self.inflight[computeKey]))
+
+        finally:
+            if self.latest.get(key) == interaction.id:
+                del self.latest[key]
+
+
+autocompleter = Autocompleter()
+
+
 class PaginatedEmbed(discord.ui.View):
     '''
     Displays an interactive paginated embed of given fields, with optional owner-locking, until timed out.
@@ -8,6 +8,9 @@ git pull
 echo 'Updating twemoji...'
 git submodule update --remote resources/twemoji
 
+echo 'Building twemoji atlas...'
+python3 profile_render.py
+
 echo 'Updating private...'
 if [[ -z "${GITHUB_TOKEN}" ]]; then
     git submodule update --remote private